@@ -1,15 +1,11 @@
 #!/usr/bin/env python3
 import json
-import shapefile
 import os
-from pyproj import Transformer
+from shapefile_geojson import iter_geometries, shapefile_crs
 
 # Define the base directory
 base_dir = "/Users/roman/claude/silvergrail/2024 Teuton Database"
 
-# Create coordinate transformer
-transformer = Transformer.from_crs("EPSG:32609", "EPSG:4326", always_xy=True)
-
 # Load existing GeoJSON
 with open("/Users/roman/claude/silvergrail/public/images/silvergrail-properties.geojson", 'r') as f:
     geojson = json.load(f)
@@ -18,20 +14,12 @@ with open("/Users/roman/claude/silvergrail/public/images/silvergrail-properties.
 ascot_shp = os.path.join(base_dir, "Ascot_Boundaries.shp")
 if os.path.exists(ascot_shp):
     print("Processing Ascot boundaries...")
-    sf = shapefile.Reader(ascot_shp)
-    shapes = sf.shapes()
+    geometries = iter_geometries(ascot_shp, shapefile_crs(ascot_shp))
     
-    for shape in shapes:
+    for geometry in geometries:
         coords = []
-        if shape.shapeType == 5:  # Polygon
-            parts = list(shape.parts) + [len(shape.points)]
-            for i in range(len(parts) - 1):
-                ring = shape.points[parts[i]:parts[i+1]]
-                ring_coords = []
-                for point in ring:
-                    lon, lat = transformer.transform(point[0], point[1])
-                    ring_coords.append([lon, lat])
-                coords.append(ring_coords)
+        if geometry and geometry["type"] == "Polygon":
+            coords = geometry["coordinates"]
         
         feature = {
             "type": "Feature",
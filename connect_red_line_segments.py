@@ -1,24 +1,21 @@
 #!/usr/bin/env python3
 """
 Connect the broken red line segments around Tonga and Clone properties
+Distances are measured in meters in the metric CRS
 """
 
 import json
-import math
+from geo_transforms import lines_to_metric
+from segment_graph import distance_between_points, endpoint_gap
 
-def distance_between_points(p1, p2):
-    """Calculate distance between two points"""
-    return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
+# Segments centred closer than this (meters) to a property are reported as near it
+NEAR_PROPERTY = 8000
 
-def interpolate_points(p1, p2, num_points=10):
-    """Create interpolated points between two points"""
-    points = []
-    for i in range(1, num_points):
-        t = i / num_points
-        lon = p1[0] + (p2[0] - p1[0]) * t
-        lat = p1[1] + (p2[1] - p1[1]) * t
-        points.append([lon, lat])
-    return points
+# Gaps centred closer than this (meters) to a property are reported as near it
+GAP_NEAR_PROPERTY = 12000
+
+# Gaps shorter than this (meters) should be connected
+MAX_GAP = 4000
 
 def analyze_gaps():
     # Read the current data
@@ -33,6 +30,9 @@ def analyze_gaps():
     # Get Tonga and Clone approximate locations from properties
     tonga_center = [-129.65, 55.70]  # Approximate from property data
     clone_center = [-129.80, 55.80]  # Approximate from property data
+    [[tonga_center, clone_center]] = lines_to_metric([[tonga_center, clone_center]])
+    
+    metric = lines_to_metric([feature['geometry']['coordinates'] for feature in features])
     
     # Sort features by their average latitude (north to south)
     features_with_info = []
@@ -40,11 +40,15 @@ def analyze_gaps():
         coords = feature['geometry']['coordinates']
         avg_lon = sum(c[0] for c in coords) / len(coords)
         avg_lat = sum(c[1] for c in coords) / len(coords)
+        points = metric[i]
+        center = [sum(c[0] for c in points) / len(points), sum(c[1] for c in points) / len(points)]
         
         features_with_info.append({
             'index': i,
             'feature': feature,
             'coords': coords,
+            'metric': points,
+            'center': center,
             'avg_lon': avg_lon,
             'avg_lat': avg_lat,
             'start': coords[0],
@@ -63,13 +67,13 @@ def analyze_gaps():
         print(f"  End: [{info['end'][0]:.4f}, {info['end'][1]:.4f}]")
         
         # Check proximity to Tonga or Clone
-        dist_to_tonga = distance_between_points([info['avg_lon'], info['avg_lat']], tonga_center)
-        dist_to_clone = distance_between_points([info['avg_lon'], info['avg_lat']], clone_center)
+        dist_to_tonga = distance_between_points(info['center'], tonga_center)
+        dist_to_clone = distance_between_points(info['center'], clone_center)
         
-        if dist_to_tonga < 0.1:
-            print(f"  ** Near TONGA (distance: {dist_to_tonga:.4f})")
-        if dist_to_clone < 0.1:
-            print(f"  ** Near CLONE (distance: {dist_to_clone:.4f})")
+        if dist_to_tonga < NEAR_PROPERTY:
+            print(f"  ** Near TONGA (distance: {dist_to_tonga:.0f} m)")
+        if dist_to_clone < NEAR_PROPERTY:
+            print(f"  ** Near CLONE (distance: {dist_to_clone:.0f} m)")
         print()
     
     # Identify gaps between consecutive segments
@@ -78,42 +82,36 @@ def analyze_gaps():
         current = features_with_info[i]
         next_seg = features_with_info[i + 1]
         
-        # Calculate all possible connections
-        distances = [
-            (distance_between_points(current['end'], next_seg['start']), 'current_end->next_start'),
-            (distance_between_points(current['end'], next_seg['end']), 'current_end->next_end'),
-            (distance_between_points(current['start'], next_seg['start']), 'current_start->next_start'),
-            (distance_between_points(current['start'], next_seg['end']), 'current_start->next_end')
-        ]
-        
-        min_dist, connection = min(distances, key=lambda x: x[0])
+        # Closest pair of endpoints
+        min_dist, current_end, next_end = endpoint_gap(current['metric'], next_seg['metric'])
+        connection = f"current_{current_end}->next_{next_end}"
         
         print(f"Gap between Segment {current['index']+1} and {next_seg['index']+1}:")
-        print(f"  Distance: {min_dist:.4f}")
+        print(f"  Distance: {min_dist:.0f} m")
         print(f"  Best connection: {connection}")
         
         # Check if gap is near Tonga or Clone
         if 'end' in connection.split('->')[0]:
-            gap_start = current['end']
+            gap_start = current['metric'][-1]
         else:
-            gap_start = current['start']
+            gap_start = current['metric'][0]
             
         if 'start' in connection.split('->')[1]:
-            gap_end = next_seg['start']
+            gap_end = next_seg['metric'][0]
         else:
-            gap_end = next_seg['end']
+            gap_end = next_seg['metric'][-1]
         
         gap_center = [(gap_start[0] + gap_end[0])/2, (gap_start[1] + gap_end[1])/2]
         
         dist_to_tonga = distance_between_points(gap_center, tonga_center)
         dist_to_clone = distance_between_points(gap_center, clone_center)
         
-        if dist_to_tonga < 0.15:
-            print(f"  ** Gap is near TONGA (distance: {dist_to_tonga:.4f})")
-        if dist_to_clone < 0.15:
-            print(f"  ** Gap is near CLONE (distance: {dist_to_clone:.4f})")
+        if dist_to_tonga < GAP_NEAR_PROPERTY:
+            print(f"  ** Gap is near TONGA (distance: {dist_to_tonga:.0f} m)")
+        if dist_to_clone < GAP_NEAR_PROPERTY:
+            print(f"  ** Gap is near CLONE (distance: {dist_to_clone:.0f} m)")
         
-        if min_dist < 0.05:  # Small gap that should be connected
+        if min_dist < MAX_GAP:  # Small gap that should be connected
             print(f"  >> SHOULD CONNECT THIS GAP")
         
         print()
@@ -4,22 +4,8 @@ Connect the broken red line segments to create a continuous line
 """
 
 import json
-import math
-
-def interpolate_points(p1, p2, max_gap=0.01):
-    """Create interpolated points between two points"""
-    distance = math.sqrt((p2[0] - p1[0])**2 + (p2[1] - p1[1])**2)
-    
-    # Calculate number of points needed based on distance
-    num_points = max(2, int(distance / max_gap))
-    
-    points = []
-    for i in range(1, num_points):
-        t = i / num_points
-        lon = p1[0] + (p2[0] - p1[0]) * t
-        lat = p1[1] + (p2[1] - p1[1]) * t
-        points.append([lon, lat])
-    return points
+from geo_transforms import lines_to_lonlat, lines_to_metric
+from segment_graph import distance_between_points, spaced_bridge
 
 def connect_segments():
     # Read the current data
@@ -38,11 +24,13 @@ def connect_segments():
     
     features.sort(key=lambda x: x['_avg_lat'], reverse=True)
     
-    # Connect all segments into one continuous line
+    # Connect all segments into one continuous line, bridging gaps over
+    # 100 m with points every 500 m. Distances are measured in the metric CRS
     connected_coords = []
+    bridge = spaced_bridge(500, min_gap=100)
+    metric = lines_to_metric([feature['geometry']['coordinates'] for feature in features])
     
-    for i, feature in enumerate(features):
-        coords = feature['geometry']['coordinates']
+    for i, coords in enumerate(metric):
         
         if i == 0:
             # First segment - add all points
@@ -53,24 +41,23 @@ def connect_segments():
             prev_end = connected_coords[-1]
             
             # Check which end of current segment is closer
-            dist_to_start = math.sqrt((prev_end[0] - coords[0][0])**2 + (prev_end[1] - coords[0][1])**2)
-            dist_to_end = math.sqrt((prev_end[0] - coords[-1][0])**2 + (prev_end[1] - coords[-1][1])**2)
+            dist_to_start = distance_between_points(prev_end, coords[0])
+            dist_to_end = distance_between_points(prev_end, coords[-1])
             
             if dist_to_start < dist_to_end:
                 # Connect to start, use normal order
                 connection_point = coords[0]
                 segment_coords = coords
-                print(f"Segment {i+1}: Connecting to start (gap: {dist_to_start:.4f})")
+                print(f"Segment {i+1}: Connecting to start (gap: {dist_to_start:.0f} m)")
             else:
                 # Connect to end, reverse the segment
                 connection_point = coords[-1]
                 segment_coords = list(reversed(coords))
-                print(f"Segment {i+1}: Connecting to end - REVERSED (gap: {dist_to_end:.4f})")
+                print(f"Segment {i+1}: Connecting to end - REVERSED (gap: {dist_to_end:.0f} m)")
             
             # Add interpolated points to bridge the gap
-            gap_distance = min(dist_to_start, dist_to_end)
-            if gap_distance > 0.001:
-                bridge_points = interpolate_points(prev_end, connection_point, max_gap=0.005)
+            bridge_points = bridge(prev_end, connection_point)
+            if bridge_points:
                 connected_coords.extend(bridge_points)
                 print(f"  Added {len(bridge_points)} bridge points")
             
@@ -78,6 +65,8 @@ def connect_segments():
             connected_coords.extend(segment_coords)
             print(f"  Added {len(segment_coords)} segment points")
     
+    [connected_coords] = lines_to_lonlat([connected_coords])
+    
     print(f"\nTotal points in connected line: {len(connected_coords)}")
     
     # Create new GeoJSON with single connected LineString
@@ -4,34 +4,11 @@ Connect only the small gaps between red line segments
 """
 
 import json
-import math
+from geo_transforms import lines_to_lonlat, lines_to_metric
+from segment_graph import chain_segments, spaced_bridge
 
-def distance_between_points(p1, p2):
-    """Calculate distance between two points"""
-    return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
-
-def interpolate_points(p1, p2, max_gap=0.005):
-    """Create interpolated points between two points"""
-    distance = math.sqrt((p2[0] - p1[0])**2 + (p2[1] - p1[1])**2)
-    
-    # Calculate number of points needed based on distance
-    num_points = max(2, int(distance / max_gap))
-    
-    points = []
-    for i in range(1, num_points):
-        t = i / num_points
-        lon = p1[0] + (p2[0] - p1[0]) * t
-        lat = p1[1] + (p2[1] - p1[1]) * t
-        points.append([lon, lat])
-    return points
-
-def connect_small_gaps():
-    # Read the current data
-    with open('public/images/fiji-goliath-red-line-final.geojson', 'r') as f:
-        geojson = json.load(f)
-    
-    features = geojson['features']
-    
+def connect_gaps(features):
+    """Pipeline stage: chain segments across gaps of up to 3 km"""
     print(f"Processing {len(features)} segments...")
     
     # Analyze segments
@@ -59,82 +36,29 @@ def connect_small_gaps():
     print("Checking for small gaps to connect:")
     print("="*60 + "\n")
     
-    # Threshold for connecting segments (0.035 degrees is about 3-4 km)
-    MAX_CONNECT_DISTANCE = 0.035
+    # Threshold for connecting segments, in meters
+    MAX_CONNECT_DISTANCE = 3000
+    
+    # Chain segments across the smallest gaps first, bridging each gap with
+    # points every 500 m. Distances are measured in the metric CRS
+    metric = lines_to_metric([seg['coords'] for seg in segments_info])
+    chains = chain_segments(metric, max_gap=MAX_CONNECT_DISTANCE, bridge=spaced_bridge(500))
+    chain_coords = lines_to_lonlat([coords for coords, _, _ in chains])
     
     # Modified features list
     modified_features = []
-    used_indices = set()
     
-    for i, seg1 in enumerate(segments_info):
-        if i in used_indices:
-            continue
-            
-        # Start with this segment's coordinates
-        combined_coords = list(seg1['coords'])
-        current_feature = seg1['feature'].copy()
-        used_indices.add(i)
-        connected_to = []
+    for combined_coords, (_, members, links) in zip(chain_coords, chains):
+        i = members[0]
+        current_feature = segments_info[i]['feature'].copy()
+        connected_to = [j+1 for j in members[1:]]
         
-        # Check for close connections to other segments
-        for j, seg2 in enumerate(segments_info):
-            if i == j or j in used_indices:
-                continue
-            
-            # Check all possible connections
-            connections = [
-                (seg1['end'], seg2['start'], 'end_to_start', False, False),
-                (seg1['end'], seg2['end'], 'end_to_end', False, True),
-                (seg1['start'], seg2['start'], 'start_to_start', True, False),
-                (seg1['start'], seg2['end'], 'start_to_end', True, True)
-            ]
-            
-            best_dist = float('inf')
-            best_connection = None
-            
-            for p1, p2, desc, reverse1, reverse2 in connections:
-                dist = distance_between_points(p1, p2)
-                if dist < best_dist:
-                    best_dist = dist
-                    best_connection = (p1, p2, desc, reverse1, reverse2)
-            
-            # If close enough, connect them
-            if best_dist < MAX_CONNECT_DISTANCE:
-                p1, p2, desc, reverse1, reverse2 = best_connection
-                
-                print(f"Connecting Segment {i+1} to Segment {j+1}:")
-                print(f"  Connection type: {desc}")
-                print(f"  Distance: {best_dist:.6f}")
-                
-                # Add bridge points
-                bridge = interpolate_points(p1, p2, max_gap=0.005)
-                
-                # Determine how to add the segments
-                if desc == 'end_to_start':
-                    # Add bridge at end, then seg2
-                    combined_coords.extend(bridge)
-                    combined_coords.extend(seg2['coords'])
-                elif desc == 'end_to_end':
-                    # Add bridge at end, then reversed seg2
-                    combined_coords.extend(bridge)
-                    combined_coords.extend(reversed(seg2['coords']))
-                elif desc == 'start_to_start':
-                    # Add reversed seg2 at start, then bridge
-                    new_coords = list(reversed(seg2['coords']))
-                    new_coords.extend(bridge)
-                    new_coords.extend(combined_coords)
-                    combined_coords = new_coords
-                elif desc == 'start_to_end':
-                    # Add seg2 at start, then bridge
-                    new_coords = list(seg2['coords'])
-                    new_coords.extend(bridge)
-                    new_coords.extend(combined_coords)
-                    combined_coords = new_coords
-                
-                used_indices.add(j)
-                connected_to.append(j+1)
-                print(f"  Added {len(bridge)} bridge points")
-                print()
+        # The ends and gap of the link chain_segments actually took
+        for a, b, (gap, end_a, end_b) in zip(members, members[1:], links):
+            print(f"Connecting Segment {a+1} to Segment {b+1}:")
+            print(f"  Connection type: {end_a}_to_{end_b}")
+            print(f"  Distance: {gap:.0f} m")
+            print()
         
         # Update the feature
         current_feature['geometry']['coordinates'] = combined_coords
@@ -152,6 +76,15 @@ def connect_small_gaps():
     print(f"Result: {len(features)} segments -> {len(modified_features)} segments")
     print("="*60 + "\n")
     
+    return modified_features
+
+def connect_small_gaps():
+    # Read the current data
+    with open('public/images/fiji-goliath-red-line-final.geojson', 'r') as f:
+        geojson = json.load(f)
+    
+    modified_features = connect_gaps(geojson['features'])
+    
     # Create output GeoJSON
     output_geojson = {
         "type": "FeatureCollection",
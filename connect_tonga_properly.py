@@ -1,66 +1,54 @@
 #!/usr/bin/env python3
 """
 Properly connect the Tonga segment to its nearest neighbors
+Segments are projected to the metric CRS once, so distances are in meters
+and bridges are laid out in meters; the connected line is converted back
+to lon/lat when it is built
 """
 
 import json
-import math
+from geo_transforms import lines_to_lonlat, lines_to_metric
+from segment_graph import distance_between_points, interpolate_points
 
-def distance_between_points(p1, p2):
-    """Calculate distance between two points"""
-    return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
+# A segment of under 10 points centred closer than this (meters) to Tonga is the Tonga segment
+TONGA_RADIUS = 1600
 
-def interpolate_points(p1, p2, num_points=5):
-    """Create interpolated points between two points"""
-    points = []
-    for i in range(1, num_points):
-        t = i / num_points
-        lon = p1[0] + (p2[0] - p1[0]) * t
-        lat = p1[1] + (p2[1] - p1[1]) * t
-        points.append([lon, lat])
-    return points
-
-def connect_tonga_segment():
-    # First restore the original 5 segments
-    with open('public/images/fiji-goliath-red-line-smooth.geojson', 'r') as f:
-        data = json.load(f)
-    
+def connect_tonga(features):
+    """Pipeline stage: route the segments north and south of Tonga through it"""
     # Tonga center for reference
-    tonga_center = [-129.65, 55.70]
+    [[tonga_center]] = lines_to_metric([[[-129.65, 55.70]]])
     
     print("Finding Tonga segment and connection points...")
     
     segments = []
     tonga_idx = None
+    metric = lines_to_metric([feature['geometry']['coordinates'] for feature in features])
     
-    for i, feature in enumerate(data['features']):
-        coords = feature['geometry']['coordinates']
-        
-        # Calculate center
-        avg_lon = sum(c[0] for c in coords) / len(coords)
-        avg_lat = sum(c[1] for c in coords) / len(coords)
+    for i, (feature, coords) in enumerate(zip(features, metric)):
+        # Calculate center (easting, northing)
+        center = [sum(c[0] for c in coords) / len(coords), sum(c[1] for c in coords) / len(coords)]
         
         # Distance to Tonga
-        dist_to_tonga = distance_between_points([avg_lon, avg_lat], tonga_center)
+        dist_to_tonga = distance_between_points(center, tonga_center)
         
         segments.append({
             'index': i,
             'feature': feature.copy(),
             'coords': coords,
-            'center': [avg_lon, avg_lat],
+            'center': center,
             'dist_to_tonga': dist_to_tonga
         })
         
         # Identify Tonga segment (small segment near Tonga)
-        if dist_to_tonga < 0.02 and len(coords) < 10:
+        if dist_to_tonga < TONGA_RADIUS and len(coords) < 10:
             tonga_idx = i
             print(f"Found Tonga segment: Segment {i+1}")
             print(f"  Points: {len(coords)}")
-            print(f"  Center: [{avg_lon:.4f}, {avg_lat:.4f}]")
+            print(f"  Distance to Tonga: {dist_to_tonga:.0f} m")
     
     if tonga_idx is None:
         print("Could not find Tonga segment!")
-        return
+        return features
     
     tonga_seg = segments[tonga_idx]
     
@@ -81,8 +69,8 @@ def connect_tonga_segment():
                 south_seg = seg
     
     print(f"\nConnecting to:")
-    print(f"  North: Segment {north_seg['index']+1} (center: {north_seg['center']})")
-    print(f"  South: Segment {south_seg['index']+1} (center: {south_seg['center']})")
+    print(f"  North: Segment {north_seg['index']+1}")
+    print(f"  South: Segment {south_seg['index']+1}")
     
     # Find best connection points
     # North connection
@@ -106,8 +94,8 @@ def connect_tonga_segment():
     south_dist, tonga_south_point, south_point, reverse_tonga_for_south, _ = min(south_connections, key=lambda x: x[0])
     
     print(f"\nConnection distances:")
-    print(f"  To north: {north_dist:.6f}")
-    print(f"  To south: {south_dist:.6f}")
+    print(f"  To north: {north_dist:.0f} m")
+    print(f"  To south: {south_dist:.0f} m")
     
     # Build connected line
     connected_features = []
@@ -140,7 +128,7 @@ def connect_tonga_segment():
             # Add south segment
             coords.extend(segments[south_seg['index']]['coords'])
             
-            new_feature['geometry']['coordinates'] = coords
+            [new_feature['geometry']['coordinates']] = lines_to_lonlat([coords])
             new_feature['properties']['name'] = "Red Line North + Tonga + South"
             connected_features.append(new_feature)
             
@@ -150,14 +138,25 @@ def connect_tonga_segment():
             # Keep other segments as is
             connected_features.append(seg['feature'])
     
+    print(f"\nTotal segments: {len(features)} -> {len(connected_features)}")
+    
+    return connected_features
+
+def connect_tonga_segment():
+    # First restore the original 5 segments
+    with open('public/images/fiji-goliath-red-line-smooth.geojson', 'r') as f:
+        data = json.load(f)
+    
+    connected_features = connect_tonga(data['features'])
+    if connected_features is data['features']:
+        return
+    
     # Create output
     output = {
         "type": "FeatureCollection",
         "features": connected_features
     }
     
-    print(f"\nTotal segments: {len(data['features'])} -> {len(connected_features)}")
-    
     # Save
     with open('public/images/fiji-goliath-red-line-tonga-connected.geojson', 'w') as f:
         json.dump(output, f, indent=2)
@@ -1,24 +1,20 @@
 #!/usr/bin/env python3
 """
 Connect the small Tonga segment to its nearest neighbors
+Segments are projected to the metric CRS once, so distances are in meters
+and bridges are laid out in meters; the connected line is converted back
+to lon/lat when it is written
 """
 
 import json
-import math
+from geo_transforms import lines_to_lonlat, lines_to_metric
+from segment_graph import distance_between_points, endpoint, endpoint_gap, interpolate_points
 
-def distance_between_points(p1, p2):
-    """Calculate distance between two points"""
-    return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
+# A segment of under 10 points centred closer than this (meters) to Tonga is the Tonga segment
+TONGA_RADIUS = 4000
 
-def interpolate_points(p1, p2, num_points=5):
-    """Create interpolated points between two points"""
-    points = []
-    for i in range(1, num_points):
-        t = i / num_points
-        lon = p1[0] + (p2[0] - p1[0]) * t
-        lat = p1[1] + (p2[1] - p1[1]) * t
-        points.append([lon, lat])
-    return points
+# Gaps longer than this (meters) to a remaining segment are bridged
+MIN_BRIDGED_GAP = 800
 
 def analyze_segments():
     # Load current data
@@ -26,12 +22,13 @@ def analyze_segments():
         data = json.load(f)
     
     # Tonga approximate center
-    tonga_center = [-129.65, 55.70]
+    [[tonga_center]] = lines_to_metric([[[-129.65, 55.70]]])
     
     print("Analyzing segments to find Tonga segment...")
     print()
     
     segments = []
+    metric = lines_to_metric([feature['geometry']['coordinates'] for feature in data['features']])
     for i, feature in enumerate(data['features']):
         coords = feature['geometry']['coordinates']
         
@@ -39,14 +36,16 @@ def analyze_segments():
         avg_lon = sum(c[0] for c in coords) / len(coords)
         avg_lat = sum(c[1] for c in coords) / len(coords)
         
-        # Distance to Tonga
-        dist_to_tonga = distance_between_points([avg_lon, avg_lat], tonga_center)
+        # Distance to Tonga, from the center in meters (easting, northing)
+        points = metric[i]
+        center = [sum(c[0] for c in points) / len(points), sum(c[1] for c in points) / len(points)]
+        dist_to_tonga = distance_between_points(center, tonga_center)
         
         segment_info = {
             'index': i,
             'feature': feature,
-            'coords': coords,
-            'center': [avg_lon, avg_lat],
+            'coords': points,
+            'center': center,
             'start': coords[0],
             'end': coords[-1],
             'num_points': len(coords),
@@ -59,16 +58,16 @@ def analyze_segments():
         print(f"  Center: [{avg_lon:.4f}, {avg_lat:.4f}]")
         print(f"  Start: [{coords[0][0]:.4f}, {coords[0][1]:.4f}]")
         print(f"  End: [{coords[-1][0]:.4f}, {coords[-1][1]:.4f}]")
-        print(f"  Distance to Tonga: {dist_to_tonga:.4f}")
+        print(f"  Distance to Tonga: {dist_to_tonga:.0f} m")
         
-        if dist_to_tonga < 0.05:  # Very close to Tonga
+        if dist_to_tonga < TONGA_RADIUS:  # Very close to Tonga
             print(f"  ** THIS IS THE TONGA SEGMENT **")
         print()
     
     # Find the Tonga segment (smallest segment near Tonga)
     tonga_segment = None
     for seg in segments:
-        if seg['dist_to_tonga'] < 0.05 and seg['num_points'] < 10:
+        if seg['dist_to_tonga'] < TONGA_RADIUS and seg['num_points'] < 10:
             tonga_segment = seg
             break
     
@@ -87,27 +86,16 @@ def analyze_segments():
         if seg['index'] == tonga_segment['index']:
             continue
         
-        # Check all possible connections
-        distances = [
-            (distance_between_points(tonga_segment['start'], seg['start']), 
-             'tonga_start', 'seg_start', tonga_segment['start'], seg['start']),
-            (distance_between_points(tonga_segment['start'], seg['end']), 
-             'tonga_start', 'seg_end', tonga_segment['start'], seg['end']),
-            (distance_between_points(tonga_segment['end'], seg['start']), 
-             'tonga_end', 'seg_start', tonga_segment['end'], seg['start']),
-            (distance_between_points(tonga_segment['end'], seg['end']), 
-             'tonga_end', 'seg_end', tonga_segment['end'], seg['end'])
-        ]
-        
-        min_dist, from_end, to_end, from_point, to_point = min(distances, key=lambda x: x[0])
+        # Closest pair of endpoints
+        min_dist, from_end, to_end = endpoint_gap(tonga_segment['coords'], seg['coords'])
         
         connections.append({
             'to_segment': seg['index'],
             'distance': min_dist,
-            'from_end': from_end,
-            'to_end': to_end,
-            'from_point': from_point,
-            'to_point': to_point
+            'from_end': f"tonga_{from_end}",
+            'to_end': f"seg_{to_end}",
+            'from_point': endpoint(tonga_segment['coords'], from_end),
+            'to_point': endpoint(seg['coords'], to_end)
         })
     
     # Sort by distance
@@ -116,7 +104,7 @@ def analyze_segments():
     print("Closest connections:")
     for i, conn in enumerate(connections[:3]):  # Show top 3
         print(f"  {i+1}. To Segment {conn['to_segment']+1}:")
-        print(f"     Distance: {conn['distance']:.6f}")
+        print(f"     Distance: {conn['distance']:.0f} m")
         print(f"     Connection: {conn['from_end']} -> {conn['to_end']}")
         print()
     
@@ -209,13 +197,13 @@ def connect_segments():
                 
                 if dist_to_start < dist_to_end:
                     # Add bridge if needed
-                    if dist_to_start > 0.01:
+                    if dist_to_start > MIN_BRIDGED_GAP:
                         bridge = interpolate_points(last_point, seg['coords'][0], 3)
                         connected_coords.extend(bridge)
                     connected_coords.extend(seg['coords'])
                 else:
                     # Add bridge if needed
-                    if dist_to_end > 0.01:
+                    if dist_to_end > MIN_BRIDGED_GAP:
                         bridge = interpolate_points(last_point, seg['coords'][-1], 3)
                         connected_coords.extend(bridge)
                     connected_coords.extend(reversed(seg['coords']))
@@ -223,6 +211,7 @@ def connect_segments():
                 connected_coords.extend(seg['coords'])
     
     print(f"\nTotal points in connected line: {len(connected_coords)}")
+    [connected_coords] = lines_to_lonlat([connected_coords])
     
     # Create new GeoJSON with single connected line
     output = {
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Convert a whole directory of adjacent-property shapefiles to one GeoJSON
+Every .shp with its .dbf alongside is converted in a bounded pool of
+worker processes, reprojected from the CRS in its .prj (UTM 9N if it
+has none), and the results are merged in file name order so the output
+does not depend on timing.
+Each feature keeps its DBF attributes and is tagged with the layer
+(shapefile name) it came from. With --stream the shapefiles are instead
+read one after another and written feature by feature, for layers too
+large to hold in memory. --aoi (or --golden-triangle) keeps only shapes
+whose bounding boxes meet a lon/lat window, and skips the rest using the
+shapefile index without reading their geometries.
+
+Example:
+    python3 convert_adjacent_directory.py adjacent/
+    python3 convert_adjacent_directory.py adjacent/ "2024 Teuton Database/*.shp" --workers 4
+    python3 convert_adjacent_directory.py MTA_ACQUIRED_TENURE_SVW.shp --stream --golden-triangle --output tenure.geojson
+"""
+
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from geo_transforms import GOLDEN_TRIANGLE_BBOX
+from shapefile_geojson import (FeatureCollectionWriter, iter_features, shapefile_crs, shapefile_features,
+                               write_features)
+
+OUTPUT_PATH = 'public/images/adjacent-properties.geojson'
+
+def find_shapefiles(inputs):
+    """Expand directories and glob patterns into a sorted list of .shp files with a .dbf"""
+    paths = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            candidates = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            candidates = glob.glob(pattern)
+        for path in candidates:
+            stem, ext = os.path.splitext(path)
+            if ext.lower() != '.shp' or not os.path.isfile(path):
+                continue
+            if not os.path.isfile(stem + '.dbf'):
+                print(f"  Skipping {os.path.basename(path)}: no .dbf")
+                continue
+            paths.add(path)
+    return sorted(paths)
+
+def layer_name(shapefile_path):
+    """Shapefile name without directory or extension"""
+    return os.path.splitext(os.path.basename(shapefile_path))[0]
+
+def convert_one(shapefile_path, aoi=None):
+    """Convert one shapefile inside a worker process"""
+    return shapefile_features(shapefile_path, shapefile_crs(shapefile_path),
+                              properties={"layer": layer_name(shapefile_path)}, aoi=aoi)
+
+def prepare_output(output_path):
+    """Create the output's directory if needed"""
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+def stream_directory(inputs, output_path=OUTPUT_PATH, aoi=None):
+    """
+    Convert every shapefile found in inputs without holding any layer in
+    memory; returns the number of features written
+    """
+    shapefiles = find_shapefiles(inputs)
+    if not shapefiles:
+        print("No shapefiles found")
+        return 0
+
+    print(f"Streaming {len(shapefiles)} shapefiles")
+    prepare_output(output_path)
+
+    failed = []
+    with FeatureCollectionWriter(output_path) as writer:
+        for path in shapefiles:
+            # A layer that fails part-way is dropped whole, as in convert_directory
+            writer.mark()
+            try:
+                for feature in iter_features(path, shapefile_crs(path), properties={"layer": layer_name(path)},
+                                             aoi=aoi):
+                    writer.write(feature)
+                print(f"  Done: {os.path.basename(path)}")
+            except Exception as e:
+                writer.rollback()
+                failed.append(path)
+                print(f"  Failed: {os.path.basename(path)}: {e}")
+
+    print(f"Wrote {writer.count} features from {len(shapefiles) - len(failed)} shapefiles to {output_path}")
+    if failed:
+        print(f"{len(failed)} shapefiles failed")
+
+    return writer.count
+
+def convert_directory(inputs, output_path=OUTPUT_PATH, workers=None, aoi=None):
+    """Convert every shapefile found in inputs and write one merged GeoJSON"""
+    shapefiles = find_shapefiles(inputs)
+    if not shapefiles:
+        print("No shapefiles found")
+        return []
+
+    workers = workers or min(4, os.cpu_count() or 1)
+    print(f"Converting {len(shapefiles)} shapefiles with {workers} workers")
+
+    results = {}
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(convert_one, path, aoi): path for path in shapefiles}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+                print(f"  Done: {os.path.basename(path)} ({len(results[path])} features)")
+            except Exception as e:
+                failed.append(path)
+                print(f"  Failed: {os.path.basename(path)}: {e}")
+
+    # Merge in file order so the output does not depend on timing
+    features = [feature for path in shapefiles if path in results for feature in results[path]]
+
+    prepare_output(output_path)
+    write_features(features, output_path)
+
+    print(f"Merged {len(features)} features from {len(results)} shapefiles into {output_path}")
+    if failed:
+        print(f"{len(failed)} shapefiles failed")
+
+    return features
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a directory of shapefiles to one GeoJSON layer")
+    parser.add_argument("inputs", nargs="+", help="shapefiles, directories or glob patterns")
+    parser.add_argument("--output", default=OUTPUT_PATH, help=f"merged GeoJSON path (default: {OUTPUT_PATH})")
+    parser.add_argument("--workers", type=int, help="shapefiles converted at once (default: min(4, CPUs))")
+    parser.add_argument("--stream", action="store_true",
+                        help="convert one shapefile at a time, writing features as they are read")
+    parser.add_argument("--aoi", type=float, nargs=4, metavar=("MIN_LON", "MIN_LAT", "MAX_LON", "MAX_LAT"),
+                        help="only convert shapes whose bounding boxes meet this window")
+    parser.add_argument("--golden-triangle", dest="aoi", action="store_const", const=GOLDEN_TRIANGLE_BBOX,
+                        help=f"same as --aoi {' '.join(str(v) for v in GOLDEN_TRIANGLE_BBOX)}")
+    args = parser.parse_args()
+
+    if args.stream:
+        if args.workers:
+            parser.error("--workers cannot be combined with --stream")
+        stream_directory(args.inputs, args.output, args.aoi)
+    else:
+        convert_directory(args.inputs, args.output, args.workers, args.aoi)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,7 @@
 #!/usr/bin/env python3
 import json
-import shapefile
 import os
-from pyproj import Transformer
+from shapefile_geojson import iter_geometries, iter_shapefile, shapefile_crs
 
 # Define the base directory
 base_dir = "/Users/roman/claude/silvergrail/2024 Teuton Database"
@@ -17,20 +16,6 @@ geojson["features"] = [f for f in geojson["features"] if f["properties"].get("ty
 print("Removed existing adjacent properties")
 print("=" * 60)
 
-def read_prj_file(shapefile_path):
-    """Read the .prj file to determine coordinate system"""
-    prj_path = shapefile_path.replace('.shp', '.prj')
-    if os.path.exists(prj_path):
-        with open(prj_path, 'r') as f:
-            prj_text = f.read()
-            # Check if it's already in WGS84
-            if 'GCS_WGS_1984' in prj_text or 'WGS_1984' in prj_text and 'UNIT["Degree"' in prj_text:
-                return 'WGS84'
-            # Check if it's UTM Zone 9N
-            elif 'UTM' in prj_text or 'Zone_9N' in prj_text or 'PROJCS' in prj_text:
-                return 'UTM'
-    return 'UNKNOWN'
-
 def process_shapefile(shapefile_path, name, company, note):
     """Process a shapefile and return features"""
     features = []
@@ -39,38 +24,22 @@ def process_shapefile(shapefile_path, name, company, note):
         print(f"  Shapefile not found: {shapefile_path}")
         return features
     
-    # Determine coordinate system
-    coord_system = read_prj_file(shapefile_path)
-    print(f"  Coordinate system: {coord_system}")
-    
-    # Create transformer if needed
-    transformer = None
-    if coord_system == 'UTM':
-        transformer = Transformer.from_crs("EPSG:32609", "EPSG:4326", always_xy=True)
+    # Determine coordinate system from the .prj; without one the
+    # coordinates are taken to be in UTM Zone 9N
+    source_crs = shapefile_crs(shapefile_path)
+    print(f"  Coordinate system: {getattr(source_crs, 'name', source_crs)}")
     
     try:
-        sf = shapefile.Reader(shapefile_path)
-        shapes = sf.shapes()
+        # Shapes are streamed and reprojected a batch at a time
+        geometries = iter_geometries(shapefile_path, source_crs)
         
-        for idx, shape in enumerate(shapes):
-            if shape.shapeType == 5:  # Polygon
+        for idx, geometry in enumerate(geometries):
+            if geometry and geometry["type"] == "Polygon":
                 coords = []
-                parts = list(shape.parts) + [len(shape.points)]
                 
-                for i in range(len(parts) - 1):
-                    ring = shape.points[parts[i]:parts[i+1]]
-                    ring_coords = []
-                    for point in ring:
-                        if transformer:
-                            # Transform from UTM to WGS84
-                            lon, lat = transformer.transform(point[0], point[1])
-                        else:
-                            # Already in WGS84 (lon, lat)
-                            lon, lat = point[0], point[1]
-                        
-                        # Sanity check for coordinates
-                        if -180 <= lon <= 180 and -90 <= lat <= 90:
-                            ring_coords.append([lon, lat])
+                for ring in geometry["coordinates"]:
+                    # Sanity check for coordinates
+                    ring_coords = [[lon, lat] for lon, lat in ring if -180 <= lon <= 180 and -90 <= lat <= 90]
                     
                     if ring_coords:
                         coords.append(ring_coords)
@@ -157,25 +126,13 @@ if os.path.exists(major_projects_shp):
     print(f"\nProcessing Major Projects for additional adjacent properties...")
     
     # Check projection
-    coord_system = read_prj_file(major_projects_shp)
-    transformer = None
-    if coord_system == 'UTM':
-        transformer = Transformer.from_crs("EPSG:32609", "EPSG:4326", always_xy=True)
+    source_crs = shapefile_crs(major_projects_shp)
     
     try:
-        sf = shapefile.Reader(major_projects_shp)
-        records = sf.records()
-        shapes = sf.shapes()
-        
-        # Get field names
-        fields = [field[0] for field in sf.fields[1:]]
-        
         # Look for NAME field
-        if 'NAME' in fields:
-            name_idx = fields.index('NAME')
-            
-            for shape, record in zip(shapes, records):
-                name = str(record[name_idx]) if name_idx < len(record) else ""
+        for geometry, attrs in iter_shapefile(major_projects_shp, source_crs):
+            if 'NAME' in attrs:
+                name = str(attrs['NAME'])
                 
                 # Map of project names to company info
                 adjacent_projects = {
@@ -199,12 +156,8 @@ if os.path.exists(major_projects_shp):
                 for project_key, project_info in adjacent_projects.items():
                     if project_key in name.upper():
                         # Handle point features
-                        if shape.shapeType == 1:  # Point
-                            point = shape.points[0]
-                            if transformer:
-                                lon, lat = transformer.transform(point[0], point[1])
-                            else:
-                                lon, lat = point[0], point[1]
+                        if geometry and geometry["type"] == "Point":
+                            lon, lat = geometry["coordinates"]
                             
                             # Create a small box around the point
                             offset = 0.02  # Approximately 2km
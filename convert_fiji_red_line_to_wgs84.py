@@ -18,6 +18,16 @@ def convert_geojson_to_wgs84(input_path, output_path):
     with open(input_path, 'r') as f:
         geojson = json.load(f)
     
+    # extract_red_line_from_tif now reprojects from the raster's own CRS,
+    # so newer extractions are already in WGS84 and must not be converted twice
+    if all(abs(coord[0]) <= 180 and abs(coord[1]) <= 90
+           for feature in geojson['features'] if feature['geometry']['type'] == 'LineString'
+           for coord in feature['geometry']['coordinates']):
+        print(f"{input_path} is already in WGS84, copying it unchanged")
+        with open(output_path, 'w') as f:
+            json.dump(geojson, f, indent=2)
+        return
+    
     # Convert each feature
     for feature in geojson['features']:
         if feature['geometry']['type'] == 'LineString':
@@ -1,8 +1,7 @@
 #!/usr/bin/env python3
 import json
-import shapefile
 import os
-from pyproj import Transformer
+from shapefile_geojson import iter_geometries, shapefile_crs
 
 # Define the base directory
 base_dir = "/Users/roman/claude/silvergrail/2024 Teuton Database"
@@ -17,11 +16,6 @@ properties = {
     "MIDAS": "Midas.shp"
 }
 
-# Create coordinate transformer
-# The shapefiles appear to be in UTM Zone 9N (EPSG:32609) based on the coordinates
-# Converting to WGS84 (EPSG:4326) for web mapping
-transformer = Transformer.from_crs("EPSG:32609", "EPSG:4326", always_xy=True)
-
 # Create GeoJSON structure
 geojson = {
     "type": "FeatureCollection",
@@ -31,23 +25,14 @@ geojson = {
 def shape_to_geojson(shapefile_path, property_name):
     """Convert a shapefile to GeoJSON feature with coordinate transformation"""
     try:
-        sf = shapefile.Reader(shapefile_path)
-        shapes = sf.shapes()
+        # Shapes are streamed and reprojected a batch at a time
+        geometries = iter_geometries(shapefile_path, shapefile_crs(shapefile_path))
         
-        for shape in shapes:
+        for geometry in geometries:
             # Get the coordinates
             coords = []
-            if shape.shapeType == 5:  # Polygon
-                # For polygons, we need to handle rings
-                parts = list(shape.parts) + [len(shape.points)]
-                for i in range(len(parts) - 1):
-                    ring = shape.points[parts[i]:parts[i+1]]
-                    # Convert UTM to lat/lon
-                    ring_coords = []
-                    for point in ring:
-                        lon, lat = transformer.transform(point[0], point[1])
-                        ring_coords.append([lon, lat])
-                    coords.append(ring_coords)
+            if geometry and geometry["type"] == "Polygon":
+                coords = geometry["coordinates"]
             
             # Create the feature
             feature = {
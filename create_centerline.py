@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 """
 Create a single centerline from parallel red line edges
+Each line is projected to the metric CRS, so jumps, strand separations and
+the strand alignment are all measured in meters
 """
 
 import json
 import math
 import numpy as np
-from scipy.signal import savgol_filter
 from collections import defaultdict
+from geo_transforms import lines_to_lonlat, lines_to_metric
+from line_smoothing import smooth_coords
+from strand_centerline import strands_are_parallel, strands_centerline
 
 def distance_between_points(p1, p2):
     """Calculate distance between two points"""
@@ -18,8 +22,8 @@ def find_centerline(coords):
     if len(coords) < 10:
         return coords
     
-    # Convert to numpy array for easier processing
-    points = np.array(coords)
+    # Convert to a numpy array in meters for easier processing
+    points = np.array(lines_to_metric([coords])[0])
     
     # Calculate distances between consecutive points
     distances = []
@@ -52,107 +56,16 @@ def find_centerline(coords):
         
         print(f"  Split into {len(segments)} segments")
         
-        # Try to pair parallel segments and average them
-        if len(segments) == 2:
-            seg1, seg2 = segments[0], segments[1]
-            
-            # Check if they're roughly parallel by comparing directions
-            if len(seg1) > 1 and len(seg2) > 1:
-                # Reverse second segment if needed (parallel lines often go in opposite directions)
-                start_dist = distance_between_points(seg1[0], seg2[0])
-                end_dist = distance_between_points(seg1[-1], seg2[-1])
-                start_rev_dist = distance_between_points(seg1[0], seg2[-1])
-                end_rev_dist = distance_between_points(seg1[-1], seg2[0])
-                
-                if start_rev_dist + end_rev_dist < start_dist + end_dist:
-                    seg2 = seg2[::-1]
-                    print("  Reversed second segment for better alignment")
-                
-                # Create centerline by averaging paired points
-                centerline = []
-                
-                # Use dynamic time warping or simple interpolation
-                if len(seg1) == len(seg2):
-                    # Simple case - same number of points
-                    for p1, p2 in zip(seg1, seg2):
-                        center = [(p1[0] + p2[0]) / 2, (p1[1] + p2[1]) / 2]
-                        centerline.append(center)
-                else:
-                    # Resample to same number of points
-                    num_points = max(len(seg1), len(seg2))
-                    
-                    # Interpolate both segments to same number of points
-                    seg1_interp = resample_line(seg1, num_points)
-                    seg2_interp = resample_line(seg2, num_points)
-                    
-                    for p1, p2 in zip(seg1_interp, seg2_interp):
-                        center = [(p1[0] + p2[0]) / 2, (p1[1] + p2[1]) / 2]
-                        centerline.append(center)
-                
-                return centerline
+        # Align the strands and average them, but only if they run side by
+        # side (within 2 km, as in simplify_red_line) rather than one after
+        # another along the route
+        if len(segments) >= 2 and strands_are_parallel(segments, max_separation=2000):
+            print(f"  Aligning {len(segments)} parallel strands")
+            [centerline] = lines_to_lonlat([strands_centerline(segments)])
+            return centerline
     
     # If no clear parallel structure, just smooth the existing line
-    return smooth_line(coords)
-
-def resample_line(coords, num_points):
-    """Resample a line to have a specific number of points"""
-    if len(coords) == num_points:
-        return coords
-    
-    # Calculate cumulative distances
-    distances = [0]
-    for i in range(1, len(coords)):
-        dist = distance_between_points(coords[i-1], coords[i])
-        distances.append(distances[-1] + dist)
-    
-    total_length = distances[-1]
-    if total_length == 0:
-        return coords
-    
-    # Create evenly spaced points
-    resampled = []
-    target_dists = np.linspace(0, total_length, num_points)
-    
-    for target_dist in target_dists:
-        # Find the segment containing this distance
-        for i in range(len(distances)-1):
-            if distances[i] <= target_dist <= distances[i+1]:
-                # Interpolate within this segment
-                segment_length = distances[i+1] - distances[i]
-                if segment_length > 0:
-                    t = (target_dist - distances[i]) / segment_length
-                    lon = coords[i][0] + t * (coords[i+1][0] - coords[i][0])
-                    lat = coords[i][1] + t * (coords[i+1][1] - coords[i][1])
-                    resampled.append([lon, lat])
-                else:
-                    resampled.append(coords[i])
-                break
-    
-    return resampled
-
-def smooth_line(coords, window_size=5):
-    """Smooth a line using Savitzky-Golay filter"""
-    if len(coords) < window_size:
-        return coords
-    
-    coords_array = np.array(coords)
-    
-    # Ensure window size is odd
-    if window_size % 2 == 0:
-        window_size += 1
-    
-    # Apply smoothing to x and y separately
-    try:
-        if len(coords) > window_size:
-            x_smooth = savgol_filter(coords_array[:, 0], window_size, 2)
-            y_smooth = savgol_filter(coords_array[:, 1], window_size, 2)
-            
-            smoothed = [[x, y] for x, y in zip(x_smooth, y_smooth)]
-            return smoothed
-    except:
-        pass
-    
-    return coords
+    return smooth_coords(coords, kind='savgol')
 
 def process_red_line():
     # Read the current data
@@ -181,7 +94,7 @@ def process_red_line():
             feature['geometry']['coordinates'] = centerline
         else:
             # Just smooth smaller segments
-            smoothed = smooth_line(coords, window_size=3)
+            smoothed = smooth_coords(coords, window=3, kind='savgol')
             feature['geometry']['coordinates'] = smoothed
             print(f"  Light smoothing applied")
         
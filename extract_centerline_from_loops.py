@@ -1,14 +1,22 @@
 #!/usr/bin/env python3
 """
 Extract centerline from closed loop segments (parallel edges of thick line)
+Segments are projected to the metric CRS once, so loop gaps and duplicate
+points are measured in meters
 """
 
 import json
-import math
+from geo_transforms import lines_to_lonlat, lines_to_metric
+from line_resample import resample_line as resample_evenly
+from line_smoothing import smooth_coords
+from medial_axis import medial_axis_centerline
+from segment_graph import distance_between_points
 
-def distance_between_points(p1, p2):
-    """Calculate distance between two points"""
-    return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
+# Segments whose ends are closer than this (meters) are outlines of a thick line
+MAX_LOOP_GAP = 800
+
+# Centerline points closer than this (meters) to the previous one are dropped
+MIN_POINT_SPACING = 10
 
 def find_loop_midpoint(coords):
     """Find the approximate midpoint of a closed loop"""
@@ -30,7 +38,7 @@ def find_loop_midpoint(coords):
     return max_idx
 
 def extract_centerline_from_loop(coords):
-    """Extract centerline from a closed loop (outline of thick line)"""
+    """Extract centerline from a closed loop (outline of thick line), in meters"""
     
     # Check if this is actually a closed loop
     start_end_dist = distance_between_points(coords[0], coords[-1])
@@ -44,8 +52,14 @@ def extract_centerline_from_loop(coords):
     
     if start_end_dist > avg_segment_length * 5:
         # Not a closed loop, just return smoothed version
-        return smooth_line(coords)
+        return smooth_coords(coords, window=3)
+    
+    # Longest path along the outline's medial axis
+    axis = medial_axis_centerline(coords)
+    if axis is not None and len(axis) >= 2:
+        return axis
     
+    # Degenerate outline: average its two halves instead
     # Find the midpoint (furthest point from start)
     mid_idx = find_loop_midpoint(coords)
     
@@ -77,7 +91,7 @@ def extract_centerline_from_loop(coords):
     # Remove duplicate points at the ends
     cleaned = [centerline[0]]
     for i in range(1, len(centerline)):
-        if distance_between_points(centerline[i], cleaned[-1]) > 0.0001:
+        if distance_between_points(centerline[i], cleaned[-1]) > MIN_POINT_SPACING:
             cleaned.append(centerline[i])
     
     return cleaned
@@ -97,92 +111,51 @@ def resample_line(coords, target_points):
                 resampled.append(coords[idx])
         return resampled
     
-    # Upsample - interpolate
-    total_dist = 0
-    distances = [0]
-    
-    for i in range(1, len(coords)):
-        dist = distance_between_points(coords[i-1], coords[i])
-        total_dist += dist
-        distances.append(total_dist)
-    
-    if total_dist == 0:
-        return coords
-    
-    resampled = []
-    step = total_dist / (target_points - 1)
-    
-    for i in range(target_points):
-        target_dist = i * step
-        
-        # Find segment containing this distance
-        for j in range(len(distances) - 1):
-            if distances[j] <= target_dist <= distances[j+1]:
-                segment_dist = distances[j+1] - distances[j]
-                if segment_dist > 0:
-                    t = (target_dist - distances[j]) / segment_dist
-                    lon = coords[j][0] + t * (coords[j+1][0] - coords[j][0])
-                    lat = coords[j][1] + t * (coords[j+1][1] - coords[j][1])
-                    resampled.append([lon, lat])
-                    break
-                else:
-                    resampled.append(coords[j])
-                    break
-    
-    return resampled
+    # Upsample - interpolate along the arc length
+    return resample_evenly(coords, target_points)
 
-def smooth_line(coords, window=3):
-    """Simple moving average smoothing"""
-    if len(coords) <= window:
-        return coords
-    
-    smoothed = []
-    half_window = window // 2
-    
-    for i in range(len(coords)):
-        start = max(0, i - half_window)
-        end = min(len(coords), i + half_window + 1)
-        
-        window_points = coords[start:end]
-        avg_lon = sum(p[0] for p in window_points) / len(window_points)
-        avg_lat = sum(p[1] for p in window_points) / len(window_points)
-        
-        smoothed.append([avg_lon, avg_lat])
-    
-    return smoothed
-
-def process_red_lines():
-    # Load the no-red-mountain version (5 segments)
-    with open('public/images/fiji-goliath-red-line-no-red-mountain.geojson', 'r') as f:
-        data = json.load(f)
-    
-    print(f"Processing {len(data['features'])} segments to extract centerlines...")
+def extract_centerlines(features):
+    """Pipeline stage: replace closed outlines by centerlines, smooth open lines"""
+    print(f"Processing {len(features)} segments to extract centerlines...")
     print()
     
     processed_features = []
+    centerlines = []
+    metric = lines_to_metric([feature['geometry']['coordinates'] for feature in features])
     
-    for i, feature in enumerate(data['features']):
-        coords = feature['geometry']['coordinates']
+    for i, coords in enumerate(metric):
         print(f"Segment {i+1}: {len(coords)} points")
         
         # Check if it's a closed loop
         start_end_dist = distance_between_points(coords[0], coords[-1])
         
-        if start_end_dist < 0.01:  # Likely a closed loop
-            print(f"  Detected closed loop (gap: {start_end_dist:.6f})")
+        if start_end_dist < MAX_LOOP_GAP:  # Likely a closed loop
+            print(f"  Detected closed loop (gap: {start_end_dist:.0f} m)")
             centerline = extract_centerline_from_loop(coords)
             print(f"  Extracted centerline: {len(centerline)} points")
         else:
-            print(f"  Not a closed loop (gap: {start_end_dist:.6f})")
+            print(f"  Not a closed loop (gap: {start_end_dist:.0f} m)")
             # Just smooth it
-            centerline = smooth_line(coords, window=5)
+            centerline = smooth_coords(coords, window=5)
             print(f"  Smoothed: {len(centerline)} points")
         
+        centerlines.append(centerline)
+    
+    for feature, centerline in zip(features, lines_to_lonlat(centerlines)):
         feature['geometry']['coordinates'] = centerline
         processed_features.append(feature)
     
     print(f"\nTotal segments: {len(processed_features)}")
     
+    return processed_features
+
+def process_red_lines():
+    # Load the no-red-mountain version (5 segments)
+    with open('public/images/fiji-goliath-red-line-no-red-mountain.geojson', 'r') as f:
+        data = json.load(f)
+    
+    processed_features = extract_centerlines(data['features'])
+    
     # Save result
     output = {
         "type": "FeatureCollection",
@@ -7,57 +7,32 @@ This version uses broader color detection to catch all red line segments
 import cv2
 import numpy as np
 import json
+import os
+from functools import partial
 from PIL import Image
 import rasterio
-from pyproj import Transformer
+from raster_cache import load_cached_raster
+from geo_transforms import lonlat_transformer, pixel_size_meters, pixels_to_lonlat
+from red_line_colors import build_color_lut, classify_pixels
+from red_line_debug import write_debug_images, write_mask_overview
+from red_line_tiles import SUBPIXEL_SIGMA, extract_contours_tiled, trace_mask
 
-def extract_red_line_enhanced(input_path, output_path):
-    """
-    Extract red line with enhanced color detection
-    """
-    
-    # Read georeferencing information
-    with rasterio.open(input_path) as src:
-        transform = src.transform
-        crs = src.crs
-        bounds = src.bounds
-        print(f"Image CRS: {crs}")
-        print(f"Image bounds: {bounds}")
-    
-    # Read the image
-    img = cv2.imread(input_path)
-    if img is None:
-        print(f"Error: Could not read image from {input_path}")
-        return
-    
-    print(f"Image shape: {img.shape}")
-    
-    # Convert BGR to RGB
-    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    
-    # Convert to HSV for better color detection
-    img_hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    
-    # Define multiple red ranges in HSV
+# Shades of red to detect, as (color space, lower, upper) ranges
+ENHANCED_RED_RANGES = (
     # Red wraps around in HSV, so we need two ranges
-    lower_red1 = np.array([0, 50, 50])
-    upper_red1 = np.array([10, 255, 255])
-    
-    lower_red2 = np.array([170, 50, 50])
-    upper_red2 = np.array([180, 255, 255])
-    
+    ("hsv", (0, 50, 50), (10, 255, 255)),
+    ("hsv", (170, 50, 50), (180, 255, 255)),
     # Also check for darker/lighter reds in RGB
-    lower_rgb_red = np.array([100, 0, 0])
-    upper_rgb_red = np.array([255, 100, 100])
-    
-    # Create masks
-    mask_hsv1 = cv2.inRange(img_hsv, lower_red1, upper_red1)
-    mask_hsv2 = cv2.inRange(img_hsv, lower_red2, upper_red2)
-    mask_rgb = cv2.inRange(img_rgb, lower_rgb_red, upper_rgb_red)
+    ("rgb", (100, 0, 0), (255, 100, 100)),
+)
+
+def build_enhanced_mask(img, ranges=ENHANCED_RED_RANGES):
+    """
+    Build the enhanced red mask for a BGR image or tile
+    """
     
-    # Combine all masks
-    mask = cv2.bitwise_or(mask_hsv1, mask_hsv2)
-    mask = cv2.bitwise_or(mask, mask_rgb)
+    # One lookup per pixel covers every red range at once
+    mask = classify_pixels(img, build_color_lut(ranges))
     
     # Apply morphological operations to connect nearby segments
     kernel_connect = np.ones((5, 5), np.uint8)
@@ -71,13 +46,75 @@ def extract_red_line_enhanced(input_path, output_path):
     kernel_dilate = np.ones((3, 3), np.uint8)
     mask = cv2.dilate(mask, kernel_dilate, iterations=1)
     
-    # Save enhanced mask for visualization
-    mask_path = output_path.replace('.geojson', '_enhanced_mask.png')
-    cv2.imwrite(mask_path, mask)
-    print(f"Saved enhanced mask to {mask_path}")
+    return mask
+
+def extract_red_line_enhanced(input_path, output_path, tile_size=None, overlap=16,
+                              subpixel=False, tolerance_m=None, debug=False, debug_crops=False,
+                              cache=False, color_ranges=None):
+    """
+    Extract red line with enhanced color detection
+    Pass tile_size to read the raster in windows instead of all at once.
+    With subpixel=True outlines are traced on a smoothed mask so vertices
+    follow the stroke edge smoothly, and tolerance_m sets the simplification
+    tolerance in ground meters instead of the fixed pixel epsilon.
+    debug=True writes a mask overview and a debug overview of all
+    segments; debug_crops adds a full-resolution crop per segment.
+    cache=True keeps the decoded pixels in a local memory-mapped cache so
+    re-runs skip decoding the GeoTIFF (tiled mode reads its windows
+    straight from the GeoTIFF and skips the cache). color_ranges replaces
+    ENHANCED_RED_RANGES with another (space, lower, upper) tuple of ranges
+    """
     
-    # Find contours
-    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    mask_fn = partial(build_enhanced_mask, ranges=color_ranges) if color_ranges else build_enhanced_mask
+    
+    tiled = bool(tile_size)
+    if cache and tiled:
+        print("Tiled mode reads windows from the GeoTIFF, so the raster cache is not used")
+    
+    img = None
+    if cache and not tiled:
+        # Decoded pixels and georeferencing from the local raster cache
+        img, meta = load_cached_raster(input_path)
+        transform, crs, bounds = meta["transform"], meta["crs"], meta["bounds"]
+        width, height = meta["width"], meta["height"]
+    else:
+        # Read georeferencing information
+        with rasterio.open(input_path) as src:
+            transform = src.transform
+            crs = src.crs
+            bounds = src.bounds
+            width, height = src.width, src.height
+    print(f"Image CRS: {crs}")
+    print(f"Image bounds: {bounds}")
+    
+    if tiled:
+        # Tiled mode: build the mask window by window and stitch the contours
+        contours = extract_contours_tiled(input_path, mask_fn, tile_size=tile_size,
+                                          overlap=overlap, external_only=True,
+                                          sigma=SUBPIXEL_SIGMA if subpixel else None)
+    else:
+        # Read the image, unless it is already mapped from the cache
+        if img is None:
+            img = cv2.imread(input_path)
+        if img is None:
+            print(f"Error: Could not read image from {input_path}")
+            return
+        
+        print(f"Image shape: {img.shape}")
+        
+        mask = mask_fn(img)
+        del img
+        
+        # Save a downsampled enhanced mask for visualization
+        if debug:
+            write_mask_overview(mask, output_path.replace('.geojson', '_enhanced_mask.png'))
+        
+        if subpixel:
+            # Marching squares on the smoothed mask for sub-pixel vertices
+            contours = trace_mask(mask, sigma=SUBPIXEL_SIGMA, external_only=True)
+        else:
+            # Find contours
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     
     print(f"Found {len(contours)} contours")
     
@@ -90,27 +127,23 @@ def extract_red_line_enhanced(input_path, output_path):
     
     print(f"Filtered to {len(filtered_contours)} significant contours")
     
-    # Create transformer from Web Mercator to WGS84
-    transformer = Transformer.from_crs("EPSG:3857", "EPSG:4326", always_xy=True)
+    # Create transformer from the raster's own CRS to WGS84
+    transformer = lonlat_transformer(crs)
+    
+    # Simplify the contour
+    epsilon = 1.5  # Slightly less aggressive simplification
+    if tolerance_m:
+        epsilon = tolerance_m / pixel_size_meters(transform, crs, width, height)
+        print(f"Simplification tolerance {tolerance_m} m = {epsilon:.2f} px")
+    simplified_contours = [cv2.approxPolyDP(contour, epsilon, False) for contour in filtered_contours]
+    
+    # Convert pixel coordinates to geographic coordinates in one batch
+    all_coords = pixels_to_lonlat(simplified_contours, transform, transformer)
     
     # Convert contours to GeoJSON features
     features = []
     
-    for i, contour in enumerate(filtered_contours):
-        # Simplify the contour
-        epsilon = 1.5  # Slightly less aggressive simplification
-        simplified = cv2.approxPolyDP(contour, epsilon, False)
-        
-        # Convert to coordinates
-        coords = []
-        for point in simplified:
-            x, y = point[0]
-            
-            # Convert pixel coordinates to geographic coordinates
-            geo_x, geo_y = transform * (x, y)
-            lon, lat = transformer.transform(geo_x, geo_y)
-            coords.append([lon, lat])
-        
+    for i, (contour, coords) in enumerate(zip(filtered_contours, all_coords)):
         # Create GeoJSON feature
         if len(coords) >= 2:
             feature = {
@@ -120,7 +153,7 @@ def extract_red_line_enhanced(input_path, output_path):
                     "name": f"Red Line Segment {i+1}",
                     "color": "#FF0000",
                     "type": "redline",
-                    "source": "Fiji-Goliath-Regional-Map.tif"
+                    "source": os.path.basename(input_path)
                 },
                 "geometry": {
                     "type": "LineString",
@@ -148,11 +181,9 @@ def extract_red_line_enhanced(input_path, output_path):
     print(f"\nSaved {len(features)} line segments to {output_path}")
     
     # Also create a debug image showing detected segments
-    debug_img = img.copy()
-    cv2.drawContours(debug_img, filtered_contours, -1, (0, 255, 0), 2)
-    debug_path = output_path.replace('.geojson', '_debug.png')
-    cv2.imwrite(debug_path, debug_img)
-    print(f"Saved debug visualization to {debug_path}")
+    if debug:
+        write_debug_images(input_path, filtered_contours, output_path, colors=[(0, 255, 0)],
+                           labels=False, limit=None, crops=debug_crops)
 
 if __name__ == "__main__":
     input_file = "Fiji-Goliath-Regional-Map.tif"
@@ -10,60 +10,97 @@ from PIL import Image
 import rasterio
 from rasterio.warp import transform_bounds
 from affine import Affine
+from geo_transforms import lonlat_transformer, pixels_to_lonlat
+from raster_cache import load_cached_raster
+from red_line_colors import build_color_lut, classify_pixels
+from red_line_debug import write_mask_overview
+from red_line_tiles import extract_contours_tiled
 
-def extract_red_line_from_tif(input_path, output_path):
-    """
-    Extract red line from TIF image and convert to GeoJSON
-    """
-    
-    # First, try to read georeferencing information if available
-    try:
-        with rasterio.open(input_path) as src:
-            # Get the transform and CRS if available
-            transform = src.transform
-            crs = src.crs
-            bounds = src.bounds
-            print(f"Image CRS: {crs}")
-            print(f"Image bounds: {bounds}")
-            has_georef = True
-    except:
-        print("No georeferencing information found in TIF")
-        has_georef = False
-    
-    # Read the image using OpenCV
-    img = cv2.imread(input_path)
-    if img is None:
-        print(f"Error: Could not read image from {input_path}")
-        return
-    
-    print(f"Image shape: {img.shape}")
-    
-    # Convert BGR to RGB
-    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    
-    # Define red color range in RGB
+# Shades of red to detect, as (color space, lower, upper) ranges
+RED_RANGES = (
     # Pure red is (255, 0, 0), but we'll allow some tolerance
-    lower_red = np.array([150, 0, 0])
-    upper_red = np.array([255, 100, 100])
-    
-    # Create mask for red pixels
-    mask = cv2.inRange(img_rgb, lower_red, upper_red)
-    
+    ("rgb", (150, 0, 0), (255, 100, 100)),
     # Also check for darker reds
-    lower_dark_red = np.array([100, 0, 0])
-    upper_dark_red = np.array([150, 50, 50])
-    mask_dark = cv2.inRange(img_rgb, lower_dark_red, upper_dark_red)
+    ("rgb", (100, 0, 0), (150, 50, 50)),
+)
+
+def build_red_mask(img):
+    """
+    Build the red mask for a BGR image or tile
+    """
     
-    # Combine masks
-    mask = cv2.bitwise_or(mask, mask_dark)
+    # One lookup per pixel covers both red ranges
+    mask = classify_pixels(img, build_color_lut(RED_RANGES))
     
     # Apply morphological operations to clean up the mask
     kernel = np.ones((3, 3), np.uint8)
     mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
     mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
     
-    # Find contours
-    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return mask
+
+def is_georeferenced(transform, crs):
+    """Whether a raster has a CRS or a real transform (plain images open with the identity)"""
+    return crs is not None or not transform.is_identity
+
+def extract_red_line_from_tif(input_path, output_path, tile_size=None, overlap=16, debug=False,
+                              cache=False):
+    """
+    Extract red line from TIF image and convert to GeoJSON
+    Pass tile_size to read the raster in windows instead of all at once,
+    debug=True to also save a downsampled copy of the mask, and cache=True
+    to keep the decoded pixels in a local cache so re-runs skip decoding
+    (tiled mode reads its windows straight from the GeoTIFF and skips the
+    cache)
+    """
+    
+    if cache and tile_size:
+        print("Tiled mode reads windows from the GeoTIFF, so the raster cache is not used")
+    
+    img = None
+    if cache and not tile_size:
+        # Decoded pixels and georeferencing from the local raster cache
+        img, meta = load_cached_raster(input_path)
+        transform, crs, bounds = meta["transform"], meta["crs"], meta["bounds"]
+        print(f"Image CRS: {crs}")
+        print(f"Image bounds: {bounds}")
+        has_georef = is_georeferenced(transform, crs)
+    else:
+        # First, try to read georeferencing information if available
+        try:
+            with rasterio.open(input_path) as src:
+                # Get the transform and CRS if available
+                transform = src.transform
+                crs = src.crs
+                bounds = src.bounds
+                print(f"Image CRS: {crs}")
+                print(f"Image bounds: {bounds}")
+                has_georef = is_georeferenced(transform, crs)
+        except:
+            has_georef = False
+    
+    if not has_georef:
+        print("No georeferencing information found in TIF")
+    
+    if tile_size and has_georef:
+        # Tiled mode: build the mask window by window and stitch the contours
+        mask = None
+        contours = extract_contours_tiled(input_path, build_red_mask, tile_size=tile_size,
+                                          overlap=overlap, external_only=True)
+    else:
+        # Read the image using OpenCV, unless it is already mapped from the cache
+        if img is None:
+            img = cv2.imread(input_path)
+        if img is None:
+            print(f"Error: Could not read image from {input_path}")
+            return
+        
+        print(f"Image shape: {img.shape}")
+        
+        mask = build_red_mask(img)
+        
+        # Find contours
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     
     print(f"Found {len(contours)} contours")
     
@@ -73,28 +110,21 @@ def extract_red_line_from_tif(input_path, output_path):
     
     print(f"Filtered to {len(filtered_contours)} significant contours")
     
+    # Simplify the contours using Douglas-Peucker algorithm
+    epsilon = 2.0  # Adjust this value to control simplification
+    simplified_contours = [cv2.approxPolyDP(contour, epsilon, False) for contour in filtered_contours]
+    
+    # Convert pixel coordinates to WGS84 in one batch, straight from the
+    # raster's own CRS. Without a CRS the map coordinates are kept as they
+    # are, and without georeferencing the pixel coordinates;
+    # we'll need to manually georeference later
+    transformer = lonlat_transformer(crs) if has_georef and crs is not None else None
+    all_coords = pixels_to_lonlat(simplified_contours, transform if has_georef else None, transformer)
+    
     # Convert contours to GeoJSON features
     features = []
     
-    for i, contour in enumerate(filtered_contours):
-        # Simplify the contour using Douglas-Peucker algorithm
-        epsilon = 2.0  # Adjust this value to control simplification
-        simplified = cv2.approxPolyDP(contour, epsilon, False)
-        
-        # Convert to coordinates
-        coords = []
-        for point in simplified:
-            x, y = point[0]
-            
-            if has_georef:
-                # Convert pixel coordinates to geographic coordinates
-                lon, lat = transform * (x, y)
-                coords.append([lon, lat])
-            else:
-                # No georeferencing, use pixel coordinates
-                # We'll need to manually georeference later
-                coords.append([float(x), float(y)])
-        
+    for i, coords in enumerate(all_coords):
         # Create GeoJSON feature
         if len(coords) >= 2:  # Need at least 2 points for a line
             feature = {
@@ -126,9 +156,8 @@ def extract_red_line_from_tif(input_path, output_path):
     print(f"Saved {len(features)} line segments to {output_path}")
     
     # Also save the mask for visualization
-    mask_path = output_path.replace('.geojson', '_mask.png')
-    cv2.imwrite(mask_path, mask)
-    print(f"Saved mask visualization to {mask_path}")
+    if debug and mask is not None:
+        write_mask_overview(mask, output_path.replace('.geojson', '_mask.png'))
     
     # If no georeferencing, provide instructions
     if not has_georef:
@@ -7,87 +7,124 @@ This version uses more sensitive detection to capture small segments
 import cv2
 import numpy as np
 import json
+import os
+from functools import partial
 from PIL import Image
 import rasterio
-from pyproj import Transformer
+from raster_cache import load_cached_raster
+from geo_transforms import lonlat_transformer, pixel_size_meters, pixels_to_lonlat
+from red_line_colors import build_color_lut, classify_pixels
+from red_line_debug import write_debug_images, write_mask_overview
+from red_line_skeleton import extract_centerlines_tiled, skeletonize_mask, trace_skeleton
+from red_line_tiles import SUBPIXEL_SIGMA, extract_contours_tiled, trace_mask
 
-def extract_red_line_precise(input_path, output_path):
+# Shades of red to detect, as (color space, lower, upper) ranges
+RED_RANGES = (
+    # HSV red detection (two ranges because red wraps around)
+    ("hsv", (0, 30, 30), (15, 255, 255)),
+    ("hsv", (165, 30, 30), (180, 255, 255)),
+    # RGB red detection with multiple ranges
+    ("rgb", (180, 0, 0), (255, 80, 80)),      # Pure red
+    ("rgb", (120, 0, 0), (180, 60, 60)),      # Darker red
+    ("rgb", (200, 50, 50), (255, 150, 150)),  # Lighter/pinkish red
+    ("rgb", (80, 0, 0), (120, 40, 40)),       # Very dark red (almost maroon)
+)
+
+def build_red_mask(img, ranges=RED_RANGES):
     """
-    Extract red line with very sensitive detection for small segments
+    Build the combined red mask for a BGR image or tile
     """
     
-    # Read georeferencing information
-    with rasterio.open(input_path) as src:
-        transform = src.transform
-        crs = src.crs
-        bounds = src.bounds
-        print(f"Image CRS: {crs}")
-        print(f"Image bounds: {bounds}")
-    
-    # Read the image
-    img = cv2.imread(input_path)
-    if img is None:
-        print(f"Error: Could not read image from {input_path}")
-        return
-    
-    print(f"Image shape: {img.shape}")
-    
-    # Convert BGR to RGB and HSV
-    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    img_hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    
-    # Create multiple masks for different shades of red
-    masks = []
-    
-    # HSV red detection (two ranges because red wraps around)
-    lower_red1_hsv = np.array([0, 30, 30])
-    upper_red1_hsv = np.array([15, 255, 255])
-    masks.append(cv2.inRange(img_hsv, lower_red1_hsv, upper_red1_hsv))
-    
-    lower_red2_hsv = np.array([165, 30, 30])
-    upper_red2_hsv = np.array([180, 255, 255])
-    masks.append(cv2.inRange(img_hsv, lower_red2_hsv, upper_red2_hsv))
-    
-    # RGB red detection with multiple ranges
-    # Pure red
-    lower_rgb1 = np.array([180, 0, 0])
-    upper_rgb1 = np.array([255, 80, 80])
-    masks.append(cv2.inRange(img_rgb, lower_rgb1, upper_rgb1))
-    
-    # Darker red
-    lower_rgb2 = np.array([120, 0, 0])
-    upper_rgb2 = np.array([180, 60, 60])
-    masks.append(cv2.inRange(img_rgb, lower_rgb2, upper_rgb2))
-    
-    # Lighter/pinkish red
-    lower_rgb3 = np.array([200, 50, 50])
-    upper_rgb3 = np.array([255, 150, 150])
-    masks.append(cv2.inRange(img_rgb, lower_rgb3, upper_rgb3))
-    
-    # Very dark red (almost maroon)
-    lower_rgb4 = np.array([80, 0, 0])
-    upper_rgb4 = np.array([120, 40, 40])
-    masks.append(cv2.inRange(img_rgb, lower_rgb4, upper_rgb4))
-    
-    # Combine all masks
-    combined_mask = masks[0]
-    for mask in masks[1:]:
-        combined_mask = cv2.bitwise_or(combined_mask, mask)
+    # One lookup per pixel covers every shade of red at once
+    combined_mask = classify_pixels(img, build_color_lut(ranges))
     
     # Use minimal morphological operations to preserve small segments
     # Just a small closing to connect very close pixels
     kernel_small = np.ones((2, 2), np.uint8)
     combined_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_CLOSE, kernel_small)
     
-    # Save mask for inspection
-    mask_path = output_path.replace('.geojson', '_precise_mask.png')
-    cv2.imwrite(mask_path, combined_mask)
-    print(f"Saved precise mask to {mask_path}")
-    
-    # Find contours with hierarchy to preserve small segments
-    contours, hierarchy = cv2.findContours(combined_mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    return combined_mask
+
+def extract_red_line_precise(input_path, output_path, tile_size=None, overlap=16, workers=None,
+                             centerline=False, subpixel=False, tolerance_m=None, debug=False,
+                             debug_crops=False, cache=False, color_ranges=None):
+    """
+    Extract red line with very sensitive detection for small segments
+    Pass tile_size to read the raster in windows instead of all at once,
+    and workers to trace those windows in parallel processes.
+    With centerline=True the mask is skeletonized and each segment is the
+    line's centerline rather than the outline of its stroke.
+    With subpixel=True outlines are traced on a smoothed mask so vertices
+    follow the stroke edge smoothly, and tolerance_m sets the simplification
+    tolerance in ground meters instead of the fixed pixel epsilon.
+    debug=True writes a mask overview and a debug overview of the first
+    20 segments; debug_crops adds a full-resolution crop per segment.
+    cache=True keeps the decoded pixels in a local memory-mapped cache so
+    re-runs skip decoding the GeoTIFF (tiled mode reads its windows
+    straight from the GeoTIFF and skips the cache). color_ranges replaces
+    RED_RANGES with another (space, lower, upper) tuple of ranges
+    """
     
-    print(f"Found {len(contours)} total contours")
+    mask_fn = partial(build_red_mask, ranges=color_ranges) if color_ranges else build_red_mask
+    
+    tiled = bool(tile_size or workers)
+    if cache and tiled:
+        print("Tiled mode reads windows from the GeoTIFF, so the raster cache is not used")
+    
+    img = None
+    if cache and not tiled:
+        # Decoded pixels and georeferencing from the local raster cache
+        img, meta = load_cached_raster(input_path)
+        transform, crs, bounds = meta["transform"], meta["crs"], meta["bounds"]
+        width, height = meta["width"], meta["height"]
+    else:
+        # Read georeferencing information
+        with rasterio.open(input_path) as src:
+            transform = src.transform
+            crs = src.crs
+            bounds = src.bounds
+            width, height = src.width, src.height
+    print(f"Image CRS: {crs}")
+    print(f"Image bounds: {bounds}")
+    
+    if tiled:
+        # Tiled mode: build the mask window by window and stitch the contours
+        if centerline:
+            contours = extract_centerlines_tiled(input_path, mask_fn, tile_size=tile_size or 2048,
+                                                 overlap=overlap, workers=workers)
+        else:
+            contours = extract_contours_tiled(input_path, mask_fn, tile_size=tile_size or 2048,
+                                              overlap=overlap, workers=workers,
+                                              sigma=SUBPIXEL_SIGMA if subpixel else None)
+        print(f"Found {len(contours)} total contours")
+    else:
+        # Read the image, unless it is already mapped from the cache
+        if img is None:
+            img = cv2.imread(input_path)
+        if img is None:
+            print(f"Error: Could not read image from {input_path}")
+            return
+        
+        print(f"Image shape: {img.shape}")
+        
+        combined_mask = mask_fn(img)
+        del img
+        
+        # Save a downsampled mask for inspection
+        if debug:
+            write_mask_overview(combined_mask, output_path.replace('.geojson', '_precise_mask.png'))
+        
+        if centerline:
+            # Thin the mask to one pixel and trace the skeleton into polylines
+            contours = trace_skeleton(skeletonize_mask(combined_mask))
+        elif subpixel:
+            # Marching squares on the smoothed mask for sub-pixel vertices
+            contours = trace_mask(combined_mask, sigma=SUBPIXEL_SIGMA)
+        else:
+            # Find contours with hierarchy to preserve small segments
+            contours, hierarchy = cv2.findContours(combined_mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+        
+        print(f"Found {len(contours)} total contours")
     
     # Filter contours - use a very low threshold to catch small segments
     min_contour_length = 5  # Very low threshold
@@ -95,35 +132,38 @@ def extract_red_line_precise(input_path, output_path):
     
     filtered_contours = []
     for contour in contours:
-        if len(contour) >= min_contour_length or cv2.contourArea(contour) >= min_contour_area:
+        if centerline:
+            # Centerlines enclose no area, so only their length counts
+            if len(contour) >= min_contour_length:
+                filtered_contours.append(contour)
+        elif len(contour) >= min_contour_length or cv2.contourArea(contour) >= min_contour_area:
             filtered_contours.append(contour)
     
-    # Sort by area for consistent ordering
-    filtered_contours = sorted(filtered_contours, key=cv2.contourArea, reverse=True)
+    # Sort by area (length for centerlines) for consistent ordering
+    if centerline:
+        filtered_contours = sorted(filtered_contours, key=lambda c: cv2.arcLength(c, False), reverse=True)
+    else:
+        filtered_contours = sorted(filtered_contours, key=cv2.contourArea, reverse=True)
     
     print(f"Filtered to {len(filtered_contours)} contours (including small segments)")
     
-    # Create transformer from Web Mercator to WGS84
-    transformer = Transformer.from_crs("EPSG:3857", "EPSG:4326", always_xy=True)
+    # Create transformer from the raster's own CRS to WGS84
+    transformer = lonlat_transformer(crs)
+    
+    # Use very minimal simplification to preserve shape
+    epsilon = 0.5  # Very small epsilon
+    if tolerance_m:
+        epsilon = tolerance_m / pixel_size_meters(transform, crs, width, height)
+        print(f"Simplification tolerance {tolerance_m} m = {epsilon:.2f} px")
+    simplified_contours = [cv2.approxPolyDP(contour, epsilon, False) for contour in filtered_contours]
+    
+    # Convert pixel coordinates to geographic coordinates in one batch
+    all_coords = pixels_to_lonlat(simplified_contours, transform, transformer)
     
     # Convert contours to GeoJSON features
     features = []
     
-    for i, contour in enumerate(filtered_contours):
-        # Use very minimal simplification to preserve shape
-        epsilon = 0.5  # Very small epsilon
-        simplified = cv2.approxPolyDP(contour, epsilon, False)
-        
-        # Convert to coordinates
-        coords = []
-        for point in simplified:
-            x, y = point[0]
-            
-            # Convert pixel coordinates to geographic coordinates
-            geo_x, geo_y = transform * (x, y)
-            lon, lat = transformer.transform(geo_x, geo_y)
-            coords.append([lon, lat])
-        
+    for i, (contour, coords) in enumerate(zip(filtered_contours, all_coords)):
         # Create GeoJSON feature
         if len(coords) >= 2:
             feature = {
@@ -135,7 +175,7 @@ def extract_red_line_precise(input_path, output_path):
                     "type": "redline",
                     "area": float(cv2.contourArea(contour)),
                     "length": len(coords),
-                    "source": "Fiji-Goliath-Regional-Map.tif"
+                    "source": os.path.basename(input_path)
                 },
                 "geometry": {
                     "type": "LineString",
@@ -162,33 +202,10 @@ def extract_red_line_precise(input_path, output_path):
     
     print(f"\nSaved {len(features)} line segments to {output_path}")
     
-    # Create a debug image showing all detected segments with different colors
-    debug_img = img.copy()
-    colors = [
-        (255, 0, 0),    # Red
-        (0, 255, 0),    # Green
-        (0, 0, 255),    # Blue
-        (255, 255, 0),  # Yellow
-        (255, 0, 255),  # Magenta
-        (0, 255, 255),  # Cyan
-        (128, 255, 0),  # Lime
-        (255, 128, 0),  # Orange
-    ]
-    
-    for i, contour in enumerate(filtered_contours[:20]):  # Show first 20
-        color = colors[i % len(colors)]
-        cv2.drawContours(debug_img, [contour], -1, color, 2)
-        # Add label
-        M = cv2.moments(contour)
-        if M["m00"] != 0:
-            cX = int(M["m10"] / M["m00"])
-            cY = int(M["m01"] / M["m00"])
-            cv2.putText(debug_img, str(i+1), (cX, cY), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-    
-    debug_path = output_path.replace('.geojson', '_debug.png')
-    cv2.imwrite(debug_path, debug_img)
-    print(f"Saved debug visualization to {debug_path}")
+    if debug:
+        # Overview plus optional per-segment crops, read from the raster on demand
+        write_debug_images(input_path, filtered_contours, output_path, closed=not centerline,
+                           crops=debug_crops)
 
 if __name__ == "__main__":
     input_file = "Fiji-Goliath-Regional-Map.tif"
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Batch red line extraction over a directory (or glob) of georeferenced maps
+Every map is extracted with the same color profile in a bounded pool of
+worker processes. Each map gets its own GeoJSON and all segments are also
+written to one merged layer, tagged with the map they came from.
+
+Example:
+    python3 extract_red_lines_batch.py maps/ --output-dir public/images/red-lines --workers 4
+    python3 extract_red_lines_batch.py "maps/*-Regional-Map.tif" --profile my_reds.json
+"""
+
+import argparse
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from extract_red_line_enhanced import ENHANCED_RED_RANGES, extract_red_line_enhanced
+from extract_red_line_precise import RED_RANGES, extract_red_line_precise
+
+EXTRACTORS = {
+    "precise": extract_red_line_precise,
+    "enhanced": extract_red_line_enhanced,
+}
+
+# Built-in color profiles, selectable by name with --profile
+PROFILES = {
+    "precise": RED_RANGES,
+    "enhanced": ENHANCED_RED_RANGES,
+}
+
+TIF_EXTENSIONS = ('.tif', '.tiff')
+
+def load_profile(profile):
+    """
+    Color ranges for a profile name or a JSON file
+    The JSON file holds a list of [space, [lower], [upper]] entries, with
+    space "hsv" or "rgb", e.g. [["rgb", [180, 0, 0], [255, 80, 80]]]
+    """
+    if profile in PROFILES:
+        return PROFILES[profile]
+
+    with open(profile) as f:
+        ranges = json.load(f)
+
+    # Tuples throughout so the compiled lookup table can be cached
+    return tuple((space, tuple(lower), tuple(upper)) for space, lower, upper in ranges)
+
+def find_maps(inputs):
+    """Expand directories and glob patterns into a sorted list of GeoTIFFs"""
+    paths = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            candidates = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            candidates = glob.glob(pattern)
+        paths.update(p for p in candidates if p.lower().endswith(TIF_EXTENSIONS) and os.path.isfile(p))
+    return sorted(paths)
+
+def output_path_for(input_path, output_dir):
+    """<output_dir>/<map name>-red-line.geojson"""
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(output_dir, f"{stem}-red-line.geojson")
+
+def extract_one(mode, input_path, output_path, color_ranges, options):
+    """Run one extraction inside a worker process"""
+    EXTRACTORS[mode](input_path, output_path, color_ranges=color_ranges, **options)
+    return output_path
+
+def merge_outputs(output_paths, merged_path):
+    """Concatenate per-map GeoJSON files, in map order, into one layer"""
+    features = []
+    for path in output_paths:
+        with open(path) as f:
+            features.extend(json.load(f)["features"])
+
+    with open(merged_path, 'w') as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f, indent=2)
+
+    print(f"Merged {len(features)} segments from {len(output_paths)} maps into {merged_path}")
+
+def run_batch(inputs, output_dir, mode="precise", profile=None, workers=None, merged_path=None,
+              options=None):
+    """Extract every map found in inputs; returns the per-map output paths"""
+    maps = find_maps(inputs)
+    if not maps:
+        print("No GeoTIFF files found")
+        return []
+
+    color_ranges = load_profile(profile or mode)
+    workers = workers or min(4, os.cpu_count() or 1)
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Extracting {len(maps)} maps ({mode}, {len(color_ranges)} color ranges) with {workers} workers")
+
+    outputs = {}
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(extract_one, mode, path, output_path_for(path, output_dir),
+                            color_ranges, options or {}): path
+            for path in maps
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                outputs[path] = future.result()
+                print(f"  Done: {os.path.basename(path)}")
+            except Exception as e:
+                failed.append(path)
+                print(f"  Failed: {os.path.basename(path)}: {e}")
+
+    # Merge in input order so the merged layer does not depend on timing
+    output_paths = [outputs[path] for path in maps if path in outputs and os.path.exists(outputs[path])]
+    if output_paths:
+        merge_outputs(output_paths, merged_path or os.path.join(output_dir, "red-lines-merged.geojson"))
+
+    if failed:
+        print(f"{len(failed)} maps failed")
+
+    return output_paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract red lines from a batch of georeferenced maps")
+    parser.add_argument("inputs", nargs="+", help="GeoTIFF files, directories or glob patterns")
+    parser.add_argument("--output-dir", default="public/images/red-lines",
+                        help="directory for the per-map GeoJSON files")
+    parser.add_argument("--merged", help="merged layer path (default: <output-dir>/red-lines-merged.geojson)")
+    parser.add_argument("--mode", choices=sorted(EXTRACTORS), default="precise",
+                        help="extractor to run on each map")
+    parser.add_argument("--profile",
+                        help=f"color profile: {', '.join(sorted(PROFILES))} or a JSON file of ranges "
+                             "(default: the mode's own ranges)")
+    parser.add_argument("--workers", type=int, help="maps processed at once (default: min(4, CPUs))")
+    parser.add_argument("--tile-size", type=int, help="read each map in tiles of this many pixels")
+    parser.add_argument("--tolerance-m", type=float, help="simplification tolerance in ground meters")
+    parser.add_argument("--subpixel", action="store_true", help="trace sub-pixel outlines")
+    parser.add_argument("--centerline", action="store_true", help="emit centerlines (precise mode only)")
+    parser.add_argument("--cache", action="store_true", help="keep decoded pixels in the raster cache")
+    parser.add_argument("--debug", action="store_true", help="write mask and debug overviews")
+    args = parser.parse_args()
+
+    options = {
+        "tile_size": args.tile_size,
+        "subpixel": args.subpixel,
+        "tolerance_m": args.tolerance_m,
+        "cache": args.cache,
+        "debug": args.debug,
+    }
+    if args.centerline:
+        if args.mode != "precise":
+            parser.error("--centerline is only available in precise mode")
+        options["centerline"] = True
+
+    run_batch(args.inputs, args.output_dir, args.mode, args.profile, args.workers, args.merged, options)
+
+if __name__ == "__main__":
+    main()
@@ -5,28 +5,8 @@ Remove small isolated segments
 """
 
 import json
-import math
-
-def distance_between_points(p1, p2):
-    """Calculate distance between two points"""
-    return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
-
-def segments_are_connected(seg1_coords, seg2_coords, threshold=0.01):
-    """Check if two segments are connected or very close"""
-    # Check all combinations of endpoints
-    seg1_start = seg1_coords[0]
-    seg1_end = seg1_coords[-1]
-    seg2_start = seg2_coords[0]
-    seg2_end = seg2_coords[-1]
-    
-    distances = [
-        distance_between_points(seg1_end, seg2_start),
-        distance_between_points(seg1_end, seg2_end),
-        distance_between_points(seg1_start, seg2_start),
-        distance_between_points(seg1_start, seg2_end)
-    ]
-    
-    return min(distances) < threshold
+from geo_transforms import GOLDEN_TRIANGLE_BBOX, lines_to_metric
+from segment_index import connect_segments
 
 def filter_main_line():
     # Read the precise extraction data
@@ -37,42 +17,20 @@ def filter_main_line():
     features = geojson['features']
     features.sort(key=lambda x: x['properties'].get('area', 0), reverse=True)
     
-    # Start with the largest segment as part of the main line
-    main_line_indices = {0}  # Start with the largest segment
-    main_line_segments = [features[0]]
-    
-    # Keep track of which segments we've checked
-    checked = set()
-    
-    # Iteratively find connected segments
-    changed = True
-    while changed:
-        changed = False
-        for i, feature in enumerate(features):
-            if i in main_line_indices or i in checked:
-                continue
-            
-            # Check if this segment connects to any segment in the main line
-            coords = feature['geometry']['coordinates']
-            
-            for main_segment in main_line_segments:
-                main_coords = main_segment['geometry']['coordinates']
-                
-                if segments_are_connected(coords, main_coords):
-                    main_line_indices.add(i)
-                    main_line_segments.append(feature)
-                    changed = True
-                    break
-            
-            checked.add(i)
+    # The main line is every segment linked to the largest one through a
+    # chain of endpoints within 800 m, found in one pass over an endpoint index
+    metric = {id(feature): coords for feature, coords in
+              zip(features, lines_to_metric([feature['geometry']['coordinates'] for feature in features]))}
+    groups = connect_segments([metric[id(feature)] for feature in features], threshold=800)
+    main_group = groups.find(0)
+    main_line_segments = [feature for i, feature in enumerate(features) if groups.find(i) == main_group]
     
     print(f"Found {len(main_line_segments)} segments in main line out of {len(features)} total")
     
     # Additional filtering based on location
     # The main red line should be in the general area of the properties
     # Approximate bounding box for the Golden Triangle area
-    min_lon, max_lon = -130.0, -129.0
-    min_lat, max_lat = 55.4, 56.2
+    min_lon, min_lat, max_lon, max_lat = GOLDEN_TRIANGLE_BBOX
     
     filtered_segments = []
     for segment in main_line_segments:
@@ -87,8 +45,10 @@ def filter_main_line():
             filtered_segments.append(segment)
     
     # Also include segments with significant area that are in the right location
+    kept_ids = {id(segment) for segment in filtered_segments}
+    candidates = []
     for feature in features:
-        if feature not in filtered_segments:
+        if id(feature) not in kept_ids:
             area = feature['properties'].get('area', 0)
             coords = feature['geometry']['coordinates']
             
@@ -99,12 +59,17 @@ def filter_main_line():
                     for coord in coords
                 )
                 if in_area:
-                    # Check if it's near any existing main line segment
-                    for main_segment in filtered_segments:
-                        main_coords = main_segment['geometry']['coordinates']
-                        if segments_are_connected(coords, main_coords, threshold=0.02):
-                            filtered_segments.append(feature)
-                            break
+                    candidates.append(feature)
+    
+    # Keep candidates within 1.6 km of the main line, directly or through
+    # other candidates that are
+    kept_count = len(filtered_segments)
+    groups = connect_segments([metric[id(segment)] for segment in filtered_segments + candidates],
+                              threshold=1600)
+    main_groups = {groups.find(i) for i in range(kept_count)}
+    for i, feature in enumerate(candidates, start=kept_count):
+        if groups.find(i) in main_groups:
+            filtered_segments.append(feature)
     
     # Sort by latitude to get a north-to-south ordering
     filtered_segments.sort(key=lambda x: x['geometry']['coordinates'][0][1], reverse=True)
@@ -4,27 +4,9 @@ Fix the red line gap at Clone property
 """
 
 import json
-import math
+from segment_graph import chain_segments, distance_between_points, endpoint, endpoint_gap, fixed_bridge
 
-def distance_between_points(p1, p2):
-    """Calculate distance between two points"""
-    return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
-
-def interpolate_points(p1, p2, num_points=5):
-    """Create interpolated points between two points"""
-    points = []
-    for i in range(1, num_points):
-        t = i / num_points
-        lon = p1[0] + (p2[0] - p1[0]) * t
-        lat = p1[1] + (p2[1] - p1[1]) * t
-        points.append([lon, lat])
-    return points
-
-def analyze_clone_gap():
-    # Load current data
-    with open('public/images/fiji-goliath-red-line-final.geojson', 'r') as f:
-        data = json.load(f)
-    
+def analyze_clone_gap(features):
     # Clone approximate center
     clone_center = [-129.80, 55.80]
     
@@ -33,7 +15,7 @@ def analyze_clone_gap():
     print()
     
     segments = []
-    for i, feature in enumerate(data['features']):
+    for i, feature in enumerate(features):
         coords = feature['geometry']['coordinates']
         
         # Calculate info
@@ -89,29 +71,17 @@ def analyze_clone_gap():
             if i >= j:
                 continue
             
-            # Check all possible endpoint connections
-            connections = [
-                (distance_between_points(seg1['start'], seg2['start']), 
-                 seg1, seg2, 'start', 'start', seg1['start'], seg2['start']),
-                (distance_between_points(seg1['start'], seg2['end']), 
-                 seg1, seg2, 'start', 'end', seg1['start'], seg2['end']),
-                (distance_between_points(seg1['end'], seg2['start']), 
-                 seg1, seg2, 'end', 'start', seg1['end'], seg2['start']),
-                (distance_between_points(seg1['end'], seg2['end']), 
-                 seg1, seg2, 'end', 'end', seg1['end'], seg2['end'])
-            ]
-            
-            min_gap = min(connections, key=lambda x: x[0])
-            dist, s1, s2, end1, end2, point1, point2 = min_gap
+            # Closest pair of endpoints
+            dist, end1, end2 = endpoint_gap(seg1['coords'], seg2['coords'])
             
             gaps.append({
                 'distance': dist,
-                'seg1': s1,
-                'seg2': s2,
+                'seg1': seg1,
+                'seg2': seg2,
                 'end1': end1,
                 'end2': end2,
-                'point1': point1,
-                'point2': point2
+                'point1': endpoint(seg1['coords'], end1),
+                'point2': endpoint(seg2['coords'], end2)
             })
     
     gaps.sort(key=lambda x: x['distance'])
@@ -125,12 +95,13 @@ def analyze_clone_gap():
     
     return segments, gaps
 
-def fix_clone_gap():
-    segments, gaps = analyze_clone_gap()
+def close_clone_gap(features):
+    """Pipeline stage: join the two segments with the smallest gap near Clone"""
+    segments, gaps = analyze_clone_gap(features)
     
     if not gaps:
         print("No gaps found to fix")
-        return
+        return features
     
     # Use the smallest gap
     gap_to_fix = gaps[0]
@@ -146,18 +117,9 @@ def fix_clone_gap():
     seg1 = gap_to_fix['seg1']
     seg2 = gap_to_fix['seg2']
     
-    # Create merged segment
-    merged_coords = list(seg1['coords'])
-    
-    # Add bridge points
-    bridge = interpolate_points(gap_to_fix['point1'], gap_to_fix['point2'], 4)
-    merged_coords.extend(bridge)
-    
-    # Add second segment (check if we need to reverse it)
-    if gap_to_fix['end2'] == 'start':
-        merged_coords.extend(seg2['coords'])
-    else:
-        merged_coords.extend(reversed(seg2['coords']))
+    # Create merged segment, joined across the gap with 3 bridge points
+    [(merged_coords, _, _)] = chain_segments([seg1['coords'], seg2['coords']], max_joins=1,
+                                          bridge=fixed_bridge(4))
     
     # Create new feature
     merged_feature = seg1['feature'].copy()
@@ -175,14 +137,25 @@ def fix_clone_gap():
         if seg['index'] not in used_indices:
             connected_features.append(seg['feature'])
     
+    print(f"\nTotal segments: {len(segments)} -> {len(connected_features)}")
+    
+    return connected_features
+
+def fix_clone_gap():
+    # Load current data
+    with open('public/images/fiji-goliath-red-line-final.geojson', 'r') as f:
+        data = json.load(f)
+    
+    connected_features = close_clone_gap(data['features'])
+    if connected_features is data['features']:
+        return
+    
     # Create output
     output = {
         "type": "FeatureCollection",
         "features": connected_features
     }
     
-    print(f"\nTotal segments: {len(segments)} -> {len(connected_features)}")
-    
     # Save
     with open('public/images/fiji-goliath-red-line-clone-fixed.geojson', 'w') as f:
         json.dump(output, f, indent=2)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Coordinate helpers for extracted red line contours
+All contour vertices are gathered into flat NumPy arrays so the affine
+pixel transform and the pyproj reprojection each run once per image
+instead of once per vertex
+"""
+
+import os
+from functools import lru_cache
+
+import numpy as np
+from pyproj import CRS, Geod, Transformer
+
+# Assumed for rasters that carry a transform but no CRS; the regional maps
+# these scripts were first written for are all Web Mercator
+DEFAULT_RASTER_CRS = "EPSG:3857"
+
+# Local metric CRS for measuring the red lines: UTM zone 9N spans 132-126 W,
+# which holds the whole Golden Triangle, with scale error under 0.1%
+METRIC_CRS = "EPSG:32609"
+
+# Assumed for shapefiles without a .prj; the Teuton and adjacent-property
+# shapefiles all come in UTM 9N
+DEFAULT_SHAPEFILE_CRS = METRIC_CRS
+
+# Project window around the Golden Triangle properties, as
+# (min_lon, min_lat, max_lon, max_lat) in WGS84
+GOLDEN_TRIANGLE_BBOX = (-130.0, 55.4, -129.0, 56.2)
+
+def pixels_to_lonlat(contours, transform=None, transformer=None):
+    """
+    Convert pixel contours to lists of [x, y] coordinate pairs
+    contours is a sequence of (N, 1, 2) or (N, 2) arrays as returned by
+    cv2.findContours / cv2.approxPolyDP. transform is the raster's affine
+    (pixel -> map CRS) and transformer an optional pyproj Transformer
+    (map CRS -> output CRS, always_xy). Returns one list per contour
+    """
+    if len(contours) == 0:
+        return []
+
+    points = [np.asarray(contour, dtype=np.float64).reshape(-1, 2) for contour in contours]
+    counts = [len(p) for p in points]
+    flat = np.concatenate(points)
+    xs, ys = flat[:, 0], flat[:, 1]
+
+    if transform is not None:
+        # Same arithmetic as transform * (x, y), applied to every vertex at once
+        xs, ys = (transform.a * xs + transform.b * ys + transform.c,
+                  transform.d * xs + transform.e * ys + transform.f)
+
+    if transformer is not None:
+        xs, ys = transformer.transform(xs, ys)
+
+    coords = np.column_stack([xs, ys]).tolist()
+
+    # Split the flat list back into one coordinate list per contour
+    offsets = np.cumsum([0] + counts).tolist()
+    return [coords[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+def lines_to_metric(lines, crs=None):
+    """
+    Project lon/lat coordinate lists into a metric CRS, all in one call
+    Distances and thresholds are then in meters whatever the direction,
+    which raw degrees are not (a degree of longitude is ~63 km here, a
+    degree of latitude ~111 km). crs defaults to METRIC_CRS
+    """
+    return pixels_to_lonlat(lines, transformer=get_transformer("EPSG:4326", crs or METRIC_CRS))
+
+def lines_to_lonlat(lines, crs=None):
+    """Inverse of lines_to_metric, for writing results back out"""
+    return pixels_to_lonlat(lines, transformer=get_transformer(crs or METRIC_CRS, "EPSG:4326"))
+
+def _crs_key(crs):
+    """Hashable, canonical text for a rasterio/pyproj CRS or an authority string"""
+    if crs is None:
+        return None
+    if hasattr(crs, "to_wkt"):
+        return crs.to_wkt()
+    return str(crs)
+
+@lru_cache(maxsize=32)
+def _cached_transformer(src_key, dst_key):
+    return Transformer.from_crs(src_key, dst_key, always_xy=True)
+
+def get_transformer(src_crs, dst_crs="EPSG:4326"):
+    """Transformer between two CRSs (always_xy), built once per CRS pair"""
+    return _cached_transformer(_crs_key(src_crs), _crs_key(dst_crs))
+
+@lru_cache(maxsize=64)
+def crs_from_wkt(wkt):
+    """
+    pyproj CRS for WKT text (OGC or ESRI flavoured, as found in .prj files)
+    Parsed once per distinct text; the text's hash is the cache key
+    """
+    return CRS.from_wkt(wkt)
+
+def read_prj(prj_path, default=None):
+    """
+    CRS declared by a .prj file, or default when the file does not exist
+    Invalid WKT raises pyproj.exceptions.CRSError
+    """
+    if not os.path.isfile(prj_path):
+        return default
+    with open(prj_path) as f:
+        return crs_from_wkt(f.read().strip())
+
+def lonlat_bounds_to(bbox, crs):
+    """
+    A lon/lat bbox as (xmin, ymin, xmax, ymax) in crs, enclosing the whole
+    window (edges are densified, since they curve once projected)
+    """
+    if crs is None:
+        return tuple(bbox)
+    return get_transformer("EPSG:4326", crs).transform_bounds(*bbox, densify_pts=21)
+
+def lonlat_transformer(crs):
+    """
+    Transformer from a raster's CRS to WGS84 lon/lat
+    Rasters without a CRS fall back to DEFAULT_RASTER_CRS with a warning
+    """
+    if crs is None:
+        print(f"Warning: raster has no CRS, assuming {DEFAULT_RASTER_CRS}")
+        crs = DEFAULT_RASTER_CRS
+    return get_transformer(crs, "EPSG:4326")
+
+def pixel_size_meters(transform, crs, width, height):
+    """
+    Ground size of one pixel in meters, measured at the raster centre
+    Map units are not ground meters in general (Web Mercator stretches by
+    1 / cos(latitude)), so the pixel's sides are measured geodesically
+    """
+    to_lonlat = lonlat_transformer(crs)
+    cx, cy = width / 2, height / 2
+    (lon0, lon1, lon2), (lat0, lat1, lat2) = to_lonlat.transform(
+        *(transform * (np.array([cx, cx + 1, cx]), np.array([cy, cy, cy + 1]))))
+
+    geod = Geod(ellps="WGS84")
+    _, _, across = geod.inv(lon0, lat0, lon1, lat1)
+    _, _, down = geod.inv(lon0, lat0, lon2, lat2)
+    return (across + down) / 2
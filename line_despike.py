@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Batch spike and outlier removal for red line coordinates
+Every interior vertex is tested against its kept neighbours in one NumPy
+pass, flagged vertices are dropped from a keep-mask, and passes repeat
+until nothing changes. Within a pass only every other vertex of a run of
+flagged neighbours is dropped, since each one's test assumed the others
+stay; the rest are re-tested on the next pass. An optional offset
+tolerance keeps every original vertex within that distance of the
+result, so repeated passes cannot wear a curve down to its chord
+"""
+
+import numpy as np
+
+def turning_angles(points):
+    """
+    Angle in degrees between p[i-1]->p[i] and p[i]->p[i+1] for each
+    interior point; 0 where either step has zero length
+    """
+    v1 = points[1:-1] - points[:-2]
+    v2 = points[2:] - points[1:-1]
+    mag = np.hypot(v1[:, 0], v1[:, 1]) * np.hypot(v2[:, 0], v2[:, 1])
+    dot = (v1 * v2).sum(axis=1)
+    cos_angle = np.divide(dot, mag, out=np.ones_like(dot), where=mag > 0)
+    return np.degrees(np.arccos(np.clip(cos_angle, -1, 1)))
+
+def midpoint_deviations(points):
+    """
+    For each interior point, its distance from the midpoint of its
+    neighbours and half the distance between those neighbours
+    """
+    prev_points, next_points = points[:-2], points[2:]
+    offset = points[1:-1] - (prev_points + next_points) / 2
+    half_span = np.hypot(*(next_points - prev_points).T) / 2
+    return np.hypot(offset[:, 0], offset[:, 1]), half_span
+
+def span_deviations(points, kept):
+    """
+    For each interior kept index, the largest distance from any original
+    point between its kept neighbours to the segment joining them
+    """
+    starts, ends = kept[:-2], kept[2:]
+    lengths = ends - starts + 1
+    first = np.cumsum(lengths) - lengths
+    span = np.repeat(np.arange(len(starts)), lengths)
+    between = points[np.arange(lengths.sum()) - np.repeat(first, lengths) + np.repeat(starts, lengths)]
+
+    a, b = points[starts][span], points[ends][span]
+    ab = b - a
+    length2 = (ab * ab).sum(axis=1)
+    t = np.divide(((between - a) * ab).sum(axis=1), length2, out=np.zeros_like(length2), where=length2 > 0)
+    nearest = a + np.clip(t, 0, 1)[:, None] * ab
+    return np.maximum.reduceat(np.hypot(*(between - nearest).T), first)
+
+def thin_runs(flagged):
+    """Keep every other flag in each run of consecutive flags, starting with the first"""
+    position = np.arange(len(flagged))
+    run_start = flagged & ~np.concatenate(([False], flagged[:-1]))
+    start_of_run = np.maximum.accumulate(np.where(run_start, position, 0))
+    return flagged & ((position - start_of_run) % 2 == 0)
+
+def remove_until_stable(coords, flag_fn, max_offset=None):
+    """
+    Keep-mask after repeatedly dropping the interior points flag_fn marks
+    flag_fn takes the kept points in order and returns a boolean per
+    interior point; the first and last points are always kept. With
+    max_offset, a point is only dropped while every original point
+    between its kept neighbours stays within max_offset of their chord
+    """
+    points = np.asarray(coords, dtype=np.float64)[:, :2]
+    keep = np.ones(len(points), dtype=bool)
+
+    while True:
+        kept = np.flatnonzero(keep)
+        if len(kept) < 3:
+            return keep
+        flagged = flag_fn(points[kept])
+        if max_offset is not None:
+            flagged &= span_deviations(points, kept) < max_offset
+        flagged = thin_runs(flagged)
+        if not flagged.any():
+            return keep
+        keep[kept[1:-1][flagged]] = False
+
+def spike_mask(coords, max_offset, angle_threshold=30):
+    """
+    Keep-mask with points turning by less than angle_threshold removed
+    Such points lie all along a gently curved line, so removal stops where
+    it would move the line by max_offset or more
+    """
+    return remove_until_stable(coords, lambda points: turning_angles(points) < angle_threshold, max_offset)
+
+def outlier_mask(coords, threshold=3):
+    """
+    Keep-mask with points removed whose distance from their neighbours'
+    midpoint is at least threshold times half the neighbours' separation
+    """
+    def is_outlier(points):
+        deviation, half_span = midpoint_deviations(points)
+        return deviation >= half_span * threshold
+    return remove_until_stable(coords, is_outlier)
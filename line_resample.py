@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Arc-length resampling for red line coordinates
+Cumulative lengths are computed once, every target position finds its
+source segment with one searchsorted call, and all points are
+interpolated together
+"""
+
+import numpy as np
+from pyproj import Geod
+
+def cumulative_length(points, geodesic=False):
+    """
+    Arc length from the first point to each point
+    Planar lengths are in coordinate units; geodesic=True treats points as
+    lon/lat and measures on the WGS84 ellipsoid in meters
+    """
+    if geodesic:
+        _, _, steps = Geod(ellps="WGS84").inv(points[:-1, 0], points[:-1, 1],
+                                              points[1:, 0], points[1:, 1])
+    else:
+        steps = np.hypot(*np.diff(points, axis=0).T)
+    return np.concatenate(([0.0], np.cumsum(steps)))
+
+def interpolate_along(points, distances, targets):
+    """Points at the given arc-length targets, linear within each segment"""
+    # Leftmost segment whose far end reaches the target
+    seg = np.searchsorted(distances[1:], targets, side='left')
+    past_end = seg >= len(points) - 1
+    seg = np.minimum(seg, len(points) - 2)
+
+    seg_length = distances[seg + 1] - distances[seg]
+    t = np.divide(targets - distances[seg], seg_length,
+                  out=np.zeros_like(targets), where=seg_length > 0)
+    result = points[seg] + t[:, None] * (points[seg + 1] - points[seg])
+    result[past_end] = points[-1]
+    return result
+
+def resample_line(coords, num_points=None, spacing_m=None):
+    """
+    Resample a line to evenly spaced points along its length
+    Give either num_points (spacing measured in coordinate units) or
+    spacing_m (lon/lat coordinates, spacing in geodesic meters; the point
+    count is rounded so the line's ends are kept)
+    """
+    if len(coords) < 2 or num_points == len(coords):
+        return coords
+
+    points = np.asarray(coords, dtype=np.float64)[:, :2]
+    distances = cumulative_length(points, geodesic=spacing_m is not None)
+    total_length = distances[-1]
+    if total_length == 0:
+        return coords
+
+    if spacing_m is not None:
+        num_points = max(2, int(round(total_length / spacing_m)) + 1)
+
+    targets = np.linspace(0, total_length, num_points)
+    return interpolate_along(points, distances, targets).tolist()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Line simplification for red line coordinates
+Douglas-Peucker runs over an explicit stack of spans, measuring every point
+of a span in one NumPy step, and Visvalingam-Whyatt drops the smallest
+triangles first. Both return a keep-mask over the input points
+"""
+
+import heapq
+
+import numpy as np
+
+def span_distances(points, first, last, segment=True):
+    """
+    Distance of points[first+1:last] to the chord points[first]->points[last]
+    segment=True measures to the chord as a segment (projections clamped to
+    its ends), segment=False to the infinite line through it
+    """
+    start = points[first]
+    chord = points[last] - start
+    offsets = points[first + 1:last] - start
+    length_sq = float(chord @ chord)
+
+    if length_sq == 0:
+        return np.hypot(offsets[:, 0], offsets[:, 1])
+
+    if segment:
+        t = np.clip(offsets @ chord / length_sq, 0, 1)
+        residual = offsets - t[:, None] * chord
+        return np.hypot(residual[:, 0], residual[:, 1])
+
+    return np.abs(offsets[:, 0] * chord[1] - offsets[:, 1] * chord[0]) / np.sqrt(length_sq)
+
+def douglas_peucker_mask(coords, epsilon, segment=True):
+    """
+    Douglas-Peucker keep-mask: points farther than epsilon from the chord of
+    their span split it, until every span is within epsilon
+    """
+    points = np.asarray(coords, dtype=np.float64)[:, :2]
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        distances = span_distances(points, first, last, segment)
+        index = int(np.argmax(distances))
+        if distances[index] > epsilon:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+
+    return keep
+
+def triangle_areas(points, prev, cur, nxt):
+    """Areas of the triangles (prev, cur, nxt), given as index arrays"""
+    a, b, c = points[prev], points[cur], points[nxt]
+    return np.abs((b[..., 0] - a[..., 0]) * (c[..., 1] - a[..., 1]) -
+                  (c[..., 0] - a[..., 0]) * (b[..., 1] - a[..., 1])) / 2
+
+def visvalingam_mask(coords, min_area=None, min_points=2):
+    """
+    Visvalingam-Whyatt keep-mask: repeatedly drop the point whose triangle
+    with its neighbours has the smallest area, while that area is below
+    min_area (or until min_points remain). A point's area never drops below
+    that of a point removed before it, so removal order stays monotonic
+    """
+    points = np.asarray(coords, dtype=np.float64)[:, :2]
+    n = len(points)
+    keep = np.ones(n, dtype=bool)
+    if n < 3:
+        return keep
+
+    prev = np.arange(-1, n - 1)
+    nxt = np.arange(1, n + 1)
+    interior = np.arange(1, n - 1)
+    areas = np.full(n, np.inf)
+    areas[interior] = triangle_areas(points, interior - 1, interior, interior + 1)
+
+    heap = [(areas[i], i) for i in interior]
+    heapq.heapify(heap)
+    remaining = n
+    floor = 0.0
+
+    while heap and remaining > max(min_points, 2):
+        area, i = heapq.heappop(heap)
+        if not keep[i] or area != areas[i]:
+            continue  # Stale entry
+        if min_area is not None and area >= min_area:
+            break
+
+        keep[i] = False
+        remaining -= 1
+        floor = max(floor, area)
+        p, q = prev[i], nxt[i]
+        nxt[p], prev[q] = q, p
+
+        for j in (p, q):
+            if 0 < j < n - 1:
+                areas[j] = max(floor, float(triangle_areas(points, prev[j], j, nxt[j])))
+                heapq.heappush(heap, (areas[j], j))
+
+    return keep
+
+def simplify_line(coords, epsilon=0.0001, method='douglas-peucker', segment=True, min_points=2):
+    """
+    Simplify a coordinate list, keeping the original point objects
+    method is 'douglas-peucker' (epsilon is a distance) or 'visvalingam'
+    (epsilon is a triangle area)
+    """
+    if len(coords) <= 2:
+        return coords
+
+    if method == 'douglas-peucker':
+        keep = douglas_peucker_mask(coords, epsilon, segment)
+    elif method == 'visvalingam':
+        keep = visvalingam_mask(coords, epsilon, min_points)
+    else:
+        raise ValueError(f"Unknown simplification method: {method}")
+
+    return [coords[i] for i in np.flatnonzero(keep)]
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Smoothing filters for red line coordinates
+Each filter is one NumPy convolution per axis. Near the ends of a line the
+kernel is cut off and renormalized over the points that exist, so end
+points are averaged over a shorter window rather than padded
+"""
+
+import numpy as np
+
+def smoothing_kernel(kind, window, sigma=None):
+    """
+    Symmetric kernel of 2 * (window // 2) + 1 taps
+    kind is 'uniform', 'weighted' (1 / (1 + 0.5 * offset), heaviest at the
+    centre) or 'gaussian' (sigma defaults to a third of the half window)
+    """
+    half = window // 2
+    offsets = np.arange(-half, half + 1, dtype=np.float64)
+
+    if kind == 'uniform':
+        return np.ones_like(offsets)
+    if kind == 'weighted':
+        return 1.0 / (1.0 + np.abs(offsets) * 0.5)
+    if kind == 'gaussian':
+        sigma = sigma or max(half / 3, 1e-6)
+        return np.exp(-0.5 * (offsets / sigma) ** 2)
+    raise ValueError(f"Unknown smoothing kernel: {kind}")
+
+def normalized_convolve(points, kernel):
+    """Convolve each column with kernel, renormalizing where it overhangs the ends"""
+    weight = np.convolve(np.ones(len(points)), kernel, mode='same')
+    return np.column_stack([
+        np.convolve(points[:, axis], kernel, mode='same') / weight
+        for axis in range(points.shape[1])
+    ])
+
+def savgol(points, window, polyorder=2):
+    """
+    Savitzky-Golay filter: the interior is one convolution with the
+    least-squares coefficients, and the first and last half windows take
+    the polynomial fitted to the first and last full window
+    """
+    half = window // 2
+    offsets = np.arange(-half, half + 1, dtype=np.float64)
+    vander = offsets[:, None] ** np.arange(polyorder + 1)
+    fit = np.linalg.pinv(vander)  # Polynomial coefficients from window values
+
+    smoothed = np.column_stack([
+        np.convolve(points[:, axis], fit[0][::-1], mode='same')
+        for axis in range(points.shape[1])
+    ])
+    if half:
+        smoothed[:half] = vander[:half] @ fit @ points[:2 * half + 1]
+        smoothed[-half:] = vander[-half:] @ fit @ points[-2 * half - 1:]
+    return smoothed
+
+def smooth_coords(coords, window=5, kind='uniform', sigma=None, polyorder=2):
+    """
+    Smooth a coordinate list with a window of about `window` points
+    kind is 'uniform', 'weighted', 'gaussian' or 'savgol' (window is made
+    odd). Lines no longer than the window are returned unchanged
+    """
+    if kind == 'savgol' and window % 2 == 0:
+        window += 1
+    if len(coords) <= window:
+        return coords
+
+    points = np.asarray(coords, dtype=np.float64)[:, :2]
+    if kind == 'savgol':
+        smoothed = savgol(points, window, polyorder)
+    else:
+        smoothed = normalized_convolve(points, smoothing_kernel(kind, window, sigma))
+    return smoothed.tolist()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Medial-axis centerlines for closed red line outlines
+The outline is densified, its Voronoi diagram is built, and the Voronoi
+edges lying inside the outline approximate the medial axis. Branches
+shorter than the prune length are cut back to their junction and the
+longest remaining path is the centerline. Loops are processed one at a
+time with a cap on densified vertices, so memory stays bounded however
+many loops a batch holds
+"""
+
+from collections import defaultdict
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
+from scipy.spatial import QhullError, Voronoi
+
+MAX_RING_POINTS = 4000
+
+def inscribed_radii(points, outline, chunk=256):
+    """Distance from each point to the nearest outline vertex, in chunks"""
+    return np.concatenate([
+        np.hypot(*(outline[None, :, :] - points[start:start + chunk, None, :]).transpose(2, 0, 1)).min(axis=1)
+        for start in range(0, len(points), chunk)
+    ])
+
+def densify_ring(ring, spacing):
+    """Closed ring (first point not repeated) with points at most `spacing` apart"""
+    following = np.roll(ring, -1, axis=0)
+    lengths = np.hypot(*(following - ring).T)
+    steps = np.maximum(np.ceil(lengths / spacing).astype(int), 1)
+
+    starts = np.repeat(np.arange(len(ring)), steps)
+    offsets = np.arange(len(starts)) - np.repeat(np.cumsum(steps) - steps, steps)
+    t = (offsets / np.repeat(steps, steps))[:, None]
+    return ring[starts] + t * (following[starts] - ring[starts])
+
+def resample_ring(ring, num_points):
+    """Closed ring (first point not repeated) resampled to num_points evenly spaced by arc length"""
+    closed = np.vstack([ring, ring[:1]])
+    distances = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(closed, axis=0).T))))
+    targets = np.linspace(0, distances[-1], num_points, endpoint=False)
+    return np.column_stack([np.interp(targets, distances, closed[:, axis]) for axis in range(2)])
+
+def points_in_ring(points, ring, chunk=1024):
+    """Even-odd point-in-polygon test, in chunks of points to bound memory"""
+    x1, y1 = ring[:, 0], ring[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    inside = np.zeros(len(points), dtype=bool)
+
+    for start in range(0, len(points), chunk):
+        px = points[start:start + chunk, 0:1]
+        py = points[start:start + chunk, 1:2]
+        straddles = (y1 > py) != (y2 > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cross_x = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+        inside[start:start + chunk] = (straddles & (px < cross_x)).sum(axis=1) % 2 == 1
+
+    return inside
+
+def prune_branches(edges, prune_length):
+    """
+    Remove leaf branches shorter than prune_length that hang off a junction
+    edges maps node -> {neighbour: length} and is modified in place
+    """
+    while True:
+        removed = False
+        for leaf in [node for node, nbrs in edges.items() if len(nbrs) == 1]:
+            if leaf not in edges or len(edges[leaf]) != 1:
+                continue
+
+            # Walk from the leaf through degree-2 nodes
+            branch = [leaf]
+            length = 0.0
+            prev, node = None, leaf
+            while True:
+                nxt = [n for n in edges[node] if n != prev]
+                if not nxt:
+                    break
+                length += edges[node][nxt[0]]
+                prev, node = node, nxt[0]
+                if len(edges[node]) != 2:
+                    break
+                branch.append(node)
+
+            if len(edges[node]) >= 3 and length < prune_length:
+                for a, b in zip(branch, branch[1:] + [node]):
+                    del edges[a][b]
+                    del edges[b][a]
+                for a in branch:
+                    del edges[a]
+                removed = True
+        if not removed:
+            return edges
+
+def longest_path(edges):
+    """
+    Longest shortest path through the graph's largest component, found with
+    two Dijkstra passes (exact on the trees a pruned medial axis usually
+    is). Returns node ids
+    """
+    nodes = sorted(edges)
+    index = {node: i for i, node in enumerate(nodes)}
+    rows, cols, weights = [], [], []
+    for a, nbrs in edges.items():
+        for b, length in nbrs.items():
+            rows.append(index[a])
+            cols.append(index[b])
+            weights.append(length)
+    graph = coo_matrix((weights, (rows, cols)), shape=(len(nodes), len(nodes))).tocsr()
+
+    _, labels = connected_components(graph, directed=False)
+    start = int(np.argmax(labels == np.argmax(np.bincount(labels))))
+
+    first = dijkstra(graph, indices=start)
+    far = int(np.argmax(np.where(np.isfinite(first), first, -1)))
+    distances, predecessors = dijkstra(graph, indices=far, return_predecessors=True)
+    end = int(np.argmax(np.where(np.isfinite(distances), distances, -1)))
+
+    path = [end]
+    while path[-1] != far:
+        path.append(int(predecessors[path[-1]]))
+    return [nodes[i] for i in path]
+
+def medial_axis_centerline(coords, spacing=None, prune_length=None, max_points=MAX_RING_POINTS):
+    """
+    Centerline of a closed outline as its longest pruned medial-axis path
+    spacing defaults to the outline's median edge length and prune_length
+    to three times the median inscribed radius, i.e. about one and a half
+    line widths. Outlines that would need more than max_points vertices
+    are resampled evenly to max_points first, so Voronoi and the
+    point-in-outline test never see more.
+    Returns a list of [x, y] points, or None for degenerate outlines
+    """
+    ring = np.asarray(coords, dtype=np.float64)[:, :2]
+    if len(ring) > 1 and np.array_equal(ring[0], ring[-1]):
+        ring = ring[:-1]
+    keep = np.ones(len(ring), dtype=bool)
+    keep[1:] = np.any(ring[1:] != ring[:-1], axis=1)
+    ring = ring[keep]
+    if len(ring) < 4:
+        return None
+
+    lengths = np.hypot(*(np.roll(ring, -1, axis=0) - ring).T)
+    if spacing is None:
+        spacing = float(np.median(lengths))
+    spacing = max(spacing, lengths.sum() / max_points)
+    if spacing <= 0:
+        return None
+    dense = densify_ring(ring, spacing)
+    if len(dense) > max_points:
+        # Too many vertices (dense input or a fine spacing): decimate the
+        # outline itself so every later step works on the bounded ring
+        ring = dense = resample_ring(ring, max_points)
+
+    try:
+        voronoi = Voronoi(dense)
+    except (QhullError, ValueError):
+        return None
+
+    # Finite Voronoi edges with both ends inside the outline
+    ridges = np.array([r for r in voronoi.ridge_vertices if r[0] >= 0 and r[1] >= 0])
+    if len(ridges) == 0:
+        return None
+    inside = points_in_ring(voronoi.vertices, ring)
+    ridges = ridges[inside[ridges[:, 0]] & inside[ridges[:, 1]]]
+    if len(ridges) == 0:
+        return None
+
+    vertices = voronoi.vertices
+    edges = defaultdict(dict)
+    for a, b in ridges:
+        length = float(np.hypot(*(vertices[a] - vertices[b])))
+        edges[a][b] = length
+        edges[b][a] = length
+
+    # Half the typical line width, from a sample of axis vertices
+    used = np.unique(ridges)
+    half_width = float(np.median(inscribed_radii(vertices[used[::max(1, len(used) // 200)]], dense)))
+    if prune_length is None:
+        prune_length = 3 * half_width
+
+    edges = prune_branches(edges, prune_length)
+    path = vertices[longest_path(edges)]
+
+    # The path's tips run into the outline's end corners, where the
+    # inscribed circle shrinks to nothing; cut them back to the end caps
+    wide = np.flatnonzero(inscribed_radii(path, dense) >= 0.8 * half_width)
+    if len(wide) >= 2:
+        path = path[wide[0]:wide[-1] + 1]
+    return path.tolist()
+
+def iter_medial_axes(loops, **options):
+    """Centerline (or None) for each loop in turn, one loop in memory at a time"""
+    for coords in loops:
+        yield medial_axis_centerline(coords, **options)
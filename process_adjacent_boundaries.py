@@ -1,15 +1,12 @@
 #!/usr/bin/env python3
 import json
-import shapefile
 import os
-from pyproj import Transformer
+from geo_transforms import GOLDEN_TRIANGLE_BBOX
+from shapefile_geojson import iter_geometries, iter_shapefile, shapefile_crs
 
 # Define the base directory
 base_dir = "/Users/roman/claude/silvergrail/2024 Teuton Database"
 
-# Create coordinate transformer from UTM Zone 9N to WGS84
-transformer = Transformer.from_crs("EPSG:32609", "EPSG:4326", always_xy=True)
-
 # Load existing GeoJSON with Silver Grail properties
 with open("/Users/roman/claude/silvergrail/public/images/silvergrail-properties.geojson", 'r') as f:
     geojson = json.load(f)
@@ -29,24 +26,14 @@ ascot_shp = ascot_v2_shp if os.path.exists(ascot_v2_shp) else ascot_v1_shp
 if os.path.exists(ascot_shp):
     print(f"\n1. Processing Ascot boundaries from: {os.path.basename(ascot_shp)}")
     try:
-        sf = shapefile.Reader(ascot_shp)
-        shapes = sf.shapes()
-        records = sf.records()
+        # Shapes are streamed and reprojected a batch at a time
+        geometries = iter_geometries(ascot_shp, shapefile_crs(ascot_shp))
         
         # Process all Ascot shapes
-        for idx, (shape, record) in enumerate(zip(shapes, records)):
-            if shape.shapeType == 5:  # Polygon
-                coords = []
-                parts = list(shape.parts) + [len(shape.points)]
-                
-                for i in range(len(parts) - 1):
-                    ring = shape.points[parts[i]:parts[i+1]]
-                    ring_coords = []
-                    for point in ring:
-                        lon, lat = transformer.transform(point[0], point[1])
-                        ring_coords.append([lon, lat])
-                    if ring_coords:  # Only add non-empty rings
-                        coords.append(ring_coords)
+        for idx, geometry in enumerate(geometries):
+            if geometry and geometry["type"] == "Polygon":
+                # Only add non-empty rings
+                coords = [ring for ring in geometry["coordinates"] if ring]
                 
                 if coords:  # Only create feature if we have coordinates
                     feature = {
@@ -84,23 +71,18 @@ major_projects_shp = os.path.join(base_dir, "Major Projects.shp")
 if os.path.exists(major_projects_shp):
     print(f"\n2. Processing IDM Mining from Major Projects...")
     try:
-        sf = shapefile.Reader(major_projects_shp)
-        records = sf.records()
-        shapes = sf.shapes()
-        
-        # Find the field indices
-        fields = [field[0] for field in sf.fields[1:]]  # Skip deletion flag field
-        name_idx = fields.index('NAME') if 'NAME' in fields else -1
+        # Only projects inside the Golden Triangle window are read at all
+        records = iter_shapefile(major_projects_shp, shapefile_crs(major_projects_shp),
+                                 aoi=GOLDEN_TRIANGLE_BBOX)
         
-        for shape, record in zip(shapes, records):
-            if name_idx >= 0:
-                name = record[name_idx]
+        for geometry, attrs in records:
+            if 'NAME' in attrs:
+                name = attrs['NAME']
                 # Look for Red Mountain (MARC) which is IDM Mining's project
                 if 'RED MOUNTAIN' in str(name).upper() and 'MARC' in str(name).upper():
                     # This is a point location, create a small boundary around it
-                    if shape.shapeType == 1:  # Point
-                        point = shape.points[0]
-                        lon, lat = transformer.transform(point[0], point[1])
+                    if geometry and geometry["type"] == "Point":
+                        lon, lat = geometry["coordinates"]
                         
                         # Create a 4km x 4km box around the point (approximate property)
                         offset = 0.02  # approximately 2km in each direction at this latitude
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Local cache of decoded rasters for repeated extraction runs
+The first run decodes the GeoTIFF once, strip by strip, into a BGR .npy
+file next to a JSON file with its transform, CRS and bounds. Both are keyed
+by the file's SHA-256, so later runs (e.g. with new color thresholds)
+memory-map the pixels instead of decoding the image again
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import rasterio
+from affine import Affine
+from rasterio.coords import BoundingBox
+from rasterio.crs import CRS
+from rasterio.windows import Window
+
+from red_line_tiles import read_window_bgr
+
+CACHE_DIR = ".raster_cache"
+
+# Rows decoded per read while filling the cache
+STRIP_ROWS = 1024
+
+def _load_index(cache_dir):
+    """Hashes already computed, keyed by path with the size and mtime they were taken at"""
+    index_path = os.path.join(cache_dir, "index.json")
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path) as f:
+        return json.load(f)
+
+def file_hash(input_path, cache_dir=CACHE_DIR):
+    """
+    SHA-256 of a file, remembered per (path, size, mtime) so an unchanged
+    file is not read again just to find its cache entry
+    """
+    stat = os.stat(input_path)
+    key = os.path.abspath(input_path)
+    index = _load_index(cache_dir)
+
+    entry = index.get(key)
+    if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+        return entry["sha256"]
+
+    digest = hashlib.sha256()
+    with open(input_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+
+    index[key] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Write then rename, so concurrent runs never see a half-written index
+    partial_path = os.path.join(cache_dir, f"index.json.{os.getpid()}")
+    with open(partial_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(partial_path, os.path.join(cache_dir, "index.json"))
+
+    return digest.hexdigest()
+
+def _build_cache(input_path, pixels_path, meta_path):
+    """Decode the raster strip by strip into a .npy file and save its metadata"""
+    with rasterio.open(input_path) as src:
+        print(f"Caching decoded pixels of {input_path} ({src.width}x{src.height})")
+
+        partial_path = f"{pixels_path}.{os.getpid()}.partial"
+        pixels = np.lib.format.open_memmap(partial_path, mode='w+', dtype=np.uint8,
+                                           shape=(src.height, src.width, 3))
+        for row in range(0, src.height, STRIP_ROWS):
+            rows = min(STRIP_ROWS, src.height - row)
+            pixels[row:row + rows] = read_window_bgr(src, Window(0, row, src.width, rows))
+        pixels.flush()
+        del pixels
+
+        meta = {
+            "source": os.path.basename(input_path),
+            "width": src.width,
+            "height": src.height,
+            "transform": list(src.transform)[:6],
+            "crs": src.crs.to_wkt() if src.crs else None,
+            "bounds": list(src.bounds),
+        }
+
+    # Both files are written aside and renamed into place, metadata first:
+    # an entry only counts as cached once its .npy exists, so an
+    # interrupted run never leaves a half-written entry
+    partial_meta_path = f"{meta_path}.{os.getpid()}.partial"
+    with open(partial_meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(partial_meta_path, meta_path)
+    os.replace(partial_path, pixels_path)
+
+def load_cached_raster(input_path, cache_dir=CACHE_DIR):
+    """
+    Decoded BGR pixels (read-only memmap) and metadata for a raster
+    The metadata dict holds width, height, transform (Affine), crs
+    (rasterio CRS or None) and bounds (left, bottom, right, top)
+    """
+    sha = file_hash(input_path, cache_dir)
+    pixels_path = os.path.join(cache_dir, f"{sha}.npy")
+    meta_path = os.path.join(cache_dir, f"{sha}.json")
+
+    if not (os.path.exists(pixels_path) and os.path.exists(meta_path)):
+        _build_cache(input_path, pixels_path, meta_path)
+    else:
+        print(f"Using cached pixels for {input_path}")
+
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta["transform"] = Affine(*meta["transform"])
+    meta["crs"] = CRS.from_wkt(meta["crs"]) if meta["crs"] else None
+    meta["bounds"] = BoundingBox(*meta["bounds"])
+
+    return np.load(pixels_path, mmap_mode='r'), meta
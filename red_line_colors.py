@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Lookup-table color classification for red line masks
+Color ranges are declared once as (color space, lower, upper) tuples and
+compiled into a 3-D lookup table over every 24-bit color. Classifying an
+image is then a single table lookup per pixel, so adding another shade of
+red costs nothing extra at extraction time
+"""
+
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+# How each supported color space is derived from a BGR image
+_CONVERSIONS = {
+    "hsv": cv2.COLOR_BGR2HSV,
+    "rgb": cv2.COLOR_BGR2RGB,
+}
+
+@lru_cache(maxsize=8)
+def build_color_lut(ranges, bits=8):
+    """
+    Compile color ranges into a (2**bits)^3 lookup table indexed [b, g, r]
+    ranges is a tuple of (space, lower, upper) tuples, where space is "hsv"
+    (OpenCV hue scale, 0-180) or "rgb". A pixel matching any range is marked.
+    bits=8 gives an exact 16 MB table; fewer bits quantize each channel and
+    classify each bin by its centre color, e.g. bits=5 for a 32x32x32 table
+    """
+    lut = np.zeros((256, 256, 256), np.uint8)
+
+    # Every green/red combination for one blue value at a time, so the
+    # build never holds more than a 256x256 image per color space
+    green, red = np.meshgrid(np.arange(256, dtype=np.uint8), np.arange(256, dtype=np.uint8),
+                             indexing='ij')
+    plane = np.empty((256, 256, 3), np.uint8)
+    plane[..., 1] = green
+    plane[..., 2] = red
+
+    for blue in range(256):
+        plane[..., 0] = blue
+        converted = {space: cv2.cvtColor(plane, code) for space, code in _CONVERSIONS.items()}
+
+        for space, lower, upper in ranges:
+            mask = cv2.inRange(converted[space], np.array(lower), np.array(upper))
+            lut[blue] |= mask
+
+    if bits < 8:
+        step = 1 << (8 - bits)
+        centres = np.arange(step // 2, 256, step)
+        lut = np.ascontiguousarray(lut[np.ix_(centres, centres, centres)])
+
+    return lut
+
+def classify_pixels(img, lut):
+    """Mask (0 or 255) of the pixels of a BGR image whose color is in the table"""
+    shift = 8 - int(np.log2(lut.shape[0]))
+    blue, green, red = img[..., 0], img[..., 1], img[..., 2]
+
+    if shift:
+        blue, green, red = blue >> shift, green >> shift, red >> shift
+
+    return lut[blue, green, red]
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Debug visualizations for red line extraction
+Instead of drawing on a full-resolution copy of the map, contours are drawn
+on a decimated overview read straight from the raster, and optionally on
+small windowed crops around each contour at full resolution
+"""
+
+import cv2
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+from red_line_tiles import read_window_bgr
+
+# Colors used to tell segments apart, in BGR
+DEBUG_COLORS = [
+    (255, 0, 0),    # Red
+    (0, 255, 0),    # Green
+    (0, 0, 255),    # Blue
+    (255, 255, 0),  # Yellow
+    (255, 0, 255),  # Magenta
+    (0, 255, 255),  # Cyan
+    (128, 255, 0),  # Lime
+    (255, 128, 0),  # Orange
+]
+
+def overview_shape(width, height, max_size):
+    """Size of an overview whose longest side is at most max_size"""
+    scale = max(1.0, max(width, height) / max_size)
+    return max(1, int(round(height / scale))), max(1, int(round(width / scale))), scale
+
+def _draw(canvas, contours, scale, offset, closed, colors, labels, thickness):
+    """Draw contours, given in full-resolution pixels, onto a scaled canvas"""
+    for i, contour in enumerate(contours):
+        color = colors[i % len(colors)]
+        points = np.round((contour.reshape(-1, 2) - offset) / scale).astype(np.int32)
+        cv2.polylines(canvas, [points], closed, color, thickness)
+
+        if not labels:
+            continue
+
+        # Label at the centroid of closed outlines, the middle vertex otherwise
+        M = cv2.moments(points)
+        if closed and M["m00"] != 0:
+            cX, cY = int(M["m10"] / M["m00"]), int(M["m01"] / M["m00"])
+        else:
+            cX, cY = points[len(points) // 2]
+        cv2.putText(canvas, str(i + 1), (int(cX), int(cY)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+def write_mask_overview(mask, path, max_size=2048):
+    """Save a downsampled copy of a full-resolution mask"""
+    height, width, _ = overview_shape(mask.shape[1], mask.shape[0], max_size)
+    small = cv2.resize(mask, (width, height), interpolation=cv2.INTER_AREA)
+    cv2.imwrite(path, small)
+    print(f"Saved mask overview to {path}")
+
+def write_debug_images(input_path, contours, output_path, closed=True, colors=DEBUG_COLORS,
+                       labels=True, limit=20, max_size=2048, crops=False, margin=32,
+                       thickness=2):
+    """
+    Draw the first `limit` contours (all if None) over the map
+    Writes <output>_debug.png, an overview at most max_size pixels across,
+    and with crops=True one full-resolution <output>_debug_<n>.png per
+    contour covering its bounding box plus margin
+    """
+    shown = contours if limit is None else contours[:limit]
+    debug_path = output_path.replace('.geojson', '_debug.png')
+
+    with rasterio.open(input_path) as src:
+        height, width, scale = overview_shape(src.width, src.height, max_size)
+        overview = read_window_bgr(src, out_shape=(height, width))
+        _draw(overview, shown, scale, 0, closed, colors, labels, thickness)
+        cv2.imwrite(debug_path, overview)
+        print(f"Saved debug visualization to {debug_path} ({width}x{height})")
+
+        if not crops:
+            return
+
+        for i, contour in enumerate(shown):
+            x, y, w, h = cv2.boundingRect(np.round(contour).astype(np.int32))
+            x0, y0 = max(0, x - margin), max(0, y - margin)
+            x1, y1 = min(src.width, x + w + margin), min(src.height, y + h + margin)
+
+            crop = read_window_bgr(src, Window(x0, y0, x1 - x0, y1 - y0))
+            _draw(crop, [contour], 1.0, np.array([x0, y0]), closed,
+                  [colors[i % len(colors)]], False, thickness)
+
+            crop_path = output_path.replace('.geojson', f'_debug_{i+1}.png')
+            cv2.imwrite(crop_path, crop)
+
+        print(f"Saved {len(shown)} debug crops next to {debug_path}")
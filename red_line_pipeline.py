@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Rebuild the red line in memory from a chain of cleanup stages
+Each cleanup script exposes its work as a stage that takes and returns a
+list of GeoJSON features. This runs any sequence of them over one parsed
+file and writes the result once, instead of every script re-reading and
+rewriting fiji-goliath-red-line-final.geojson.
+
+The stages expect the raw main line (filter_main_red_line's output) and
+cannot be re-run on their own output, so the input defaults to that file
+and may never be the output.
+
+Example:
+    python3 red_line_pipeline.py
+    python3 red_line_pipeline.py --stages remove-red-mountain centerlines despike \\
+        --output /tmp/red-line-despiked.geojson
+"""
+
+import argparse
+import json
+import os
+
+from connect_small_gaps import connect_gaps
+from connect_tonga_properly import connect_tonga
+from extract_centerline_from_loops import extract_centerlines
+from fix_clone_gap import close_clone_gap
+from remove_red_mountain_segment import remove_red_mountain
+from remove_spikes import despike_features
+from simplify_red_line import simplify_features
+
+STAGES = {
+    "remove-red-mountain": remove_red_mountain,
+    "centerlines": extract_centerlines,
+    "despike": despike_features,
+    "connect-tonga": connect_tonga,
+    "fix-clone-gap": close_clone_gap,
+    "connect-gaps": connect_gaps,
+    "simplify": simplify_features,
+}
+
+# Order the scripts were run in to build the published red line
+DEFAULT_STAGES = ["remove-red-mountain", "centerlines", "despike", "connect-tonga",
+                  "fix-clone-gap", "connect-gaps", "simplify"]
+
+MAIN_PATH = 'public/images/fiji-goliath-red-line-main.geojson'
+FINAL_PATH = 'public/images/fiji-goliath-red-line-final.geojson'
+
+def run_stages(features, stages):
+    """Apply the named stages in order to a list of features"""
+    for name in stages:
+        print(f"\n=== {name} ===")
+        features = STAGES[name](features)
+    return features
+
+def run_pipeline(input_path, output_path, stages):
+    """Parse input_path once, run the stages and write output_path once"""
+    if os.path.realpath(input_path) == os.path.realpath(output_path):
+        raise ValueError(f"refusing to overwrite the input {input_path} with the stages' output")
+
+    with open(input_path, 'r') as f:
+        geojson = json.load(f)
+
+    features = run_stages(geojson['features'], stages)
+
+    output = {
+        "type": "FeatureCollection",
+        "features": features
+    }
+    with open(output_path, 'w') as f:
+        json.dump(output, f, indent=2)
+
+    print(f"\nWrote {len(features)} segments to {output_path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run red line cleanup stages in memory")
+    parser.add_argument("--input", default=MAIN_PATH,
+                        help=f"raw main line GeoJSON to start from (default: {MAIN_PATH})")
+    parser.add_argument("--output", default=FINAL_PATH, help=f"GeoJSON to write (default: {FINAL_PATH})")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=DEFAULT_STAGES,
+                        help=f"stages to run, in order (default: {' '.join(DEFAULT_STAGES)})")
+    args = parser.parse_args()
+
+    run_pipeline(args.input, args.output, args.stages)
+
+if __name__ == "__main__":
+    main()
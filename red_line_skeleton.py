@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Skeleton centerline extraction for red line masks
+The binary mask is thinned to a one-pixel-wide skeleton and the skeleton
+pixels are traced into a graph of polylines: chains run between endpoints
+and junctions, and closed loops with no junction come out as rings. This
+gives the centerline directly instead of recovering it from outlines
+"""
+
+from collections import Counter
+
+import cv2
+import numpy as np
+
+from red_line_tiles import map_tiles, read_window_bgr
+
+try:
+    from skimage.morphology import skeletonize as _skimage_skeletonize
+except ImportError:
+    _skimage_skeletonize = None
+
+# The 8 neighbour offsets as (dy, dx); orthogonal ones first
+_NEIGHBOURS = ((-1, 0), (0, 1), (1, 0), (0, -1), (-1, 1), (1, 1), (1, -1), (-1, -1))
+
+def _zhang_suen(mask):
+    """
+    Zhang-Suen thinning in NumPy, for when no compiled thinning is available
+    Each sub-iteration only re-examines pixels next to something removed in
+    the previous two, so the work follows the shrinking boundary
+    """
+    img = np.pad((mask > 0).astype(np.uint8), 1)
+    width = img.shape[1]
+    flat = img.reshape(-1)
+
+    # Neighbours P2..P9 as flat offsets, clockwise from north
+    offsets = np.array([-width, -width + 1, 1, width + 1, width, width - 1, -1, -width - 1])
+
+    # Start from every foreground pixel that touches the background
+    ys, xs = np.nonzero(img)
+    pixels = ys * width + xs
+    boundary = pixels[(flat[pixels[:, None] + offsets] == 0).any(axis=1)]
+    recent = [boundary, boundary]
+
+    step = 0
+    idle = 0
+    while idle < 2:
+        candidates = np.unique(np.concatenate(recent))
+        candidates = candidates[flat[candidates] == 1]
+
+        p = flat[candidates[:, None] + offsets].astype(np.int32)
+        p2, p4, p6, p8 = p[:, 0], p[:, 2], p[:, 4], p[:, 6]
+        count = p.sum(axis=1)
+        transitions = ((p == 0) & (np.roll(p, -1, axis=1) == 1)).sum(axis=1)
+
+        if step == 0:
+            keep_shape = (p2 * p4 * p6 == 0) & (p4 * p6 * p8 == 0)
+        else:
+            keep_shape = (p2 * p4 * p8 == 0) & (p2 * p6 * p8 == 0)
+
+        removed = candidates[(count >= 2) & (count <= 6) & (transitions == 1) & keep_shape]
+        flat[removed] = 0
+
+        recent = [recent[1], (removed[:, None] + offsets).reshape(-1)]
+        idle = idle + 1 if len(removed) == 0 else 0
+        step = 1 - step
+
+    return img[1:-1, 1:-1] > 0
+
+def skeletonize_mask(mask):
+    """
+    Thin a binary mask to a one-pixel-wide boolean skeleton
+    Uses OpenCV's contrib thinning or scikit-image when installed,
+    otherwise a NumPy Zhang-Suen implementation
+    """
+    if hasattr(cv2, "ximgproc"):
+        binary = np.where(mask > 0, 255, 0).astype(np.uint8)
+        return cv2.ximgproc.thinning(binary, thinningType=cv2.ximgproc.THINNING_ZHANGSUEN) > 0
+
+    if _skimage_skeletonize is not None:
+        return _skimage_skeletonize(mask > 0)
+
+    return _zhang_suen(mask)
+
+def _neighbour_table(ys, xs, width):
+    """
+    Index of each skeleton pixel's neighbours (-1 where there is none)
+    Diagonal steps are dropped when an orthogonal pixel already links the
+    two (m-adjacency), so staircase corners do not read as junctions
+    """
+    stride = width + 2
+    keys = (ys.astype(np.int64) + 1) * stride + (xs.astype(np.int64) + 1)
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+
+    neighbours = np.full((len(keys), 8), -1, np.int64)
+    for k, (dy, dx) in enumerate(_NEIGHBOURS):
+        target = keys + dy * stride + dx
+        pos = np.minimum(np.searchsorted(sorted_keys, target), len(keys) - 1)
+        found = sorted_keys[pos] == target
+        neighbours[found, k] = order[pos[found]]
+
+    for k, (dy, dx) in enumerate(_NEIGHBOURS[4:], start=4):
+        vertical = _NEIGHBOURS.index((dy, 0))
+        horizontal = _NEIGHBOURS.index((0, dx))
+        linked = (neighbours[:, vertical] >= 0) | (neighbours[:, horizontal] >= 0)
+        neighbours[linked, k] = -1
+
+    return neighbours
+
+def _walk_paths(neighbours):
+    """Split the skeleton graph into pixel-index paths between nodes, plus rings"""
+    adjacency = [[n for n in row if n >= 0] for row in neighbours.tolist()]
+    degree = [len(a) for a in adjacency]
+    visited = [False] * len(adjacency)
+    paths = []
+
+    # Chains starting at every endpoint or junction
+    for node, nbrs in enumerate(adjacency):
+        if degree[node] == 2:
+            continue
+        visited[node] = True
+        for first in nbrs:
+            if degree[first] == 2 and visited[first]:
+                continue
+            if degree[first] != 2 and first < node:
+                continue  # Direct node-to-node step, already taken from the other end
+
+            path = [node, first]
+            prev, cur = node, first
+            while degree[cur] == 2 and not visited[cur]:
+                visited[cur] = True
+                nxt = adjacency[cur][0] if adjacency[cur][0] != prev else adjacency[cur][1]
+                path.append(nxt)
+                prev, cur = cur, nxt
+            paths.append(path)
+
+    # Whatever is left are loops made only of degree-2 pixels
+    for start in range(len(adjacency)):
+        if visited[start] or degree[start] != 2:
+            continue
+        path = [start]
+        visited[start] = True
+        prev, cur = start, adjacency[start][0]
+        while cur != start:
+            visited[cur] = True
+            path.append(cur)
+            nxt = adjacency[cur][0] if adjacency[cur][0] != prev else adjacency[cur][1]
+            prev, cur = cur, nxt
+        path.append(start)
+        paths.append(path)
+
+    return paths
+
+def _prune_spurs(paths, spur_length):
+    """
+    Drop short branches hanging off junctions, then join the chains that
+    meet at nodes left with exactly two path ends
+    """
+    paths = [p for p in paths if len(p) >= 2]
+
+    while True:
+        ends = Counter()
+        for p in paths:
+            ends[p[0]] += 1
+            ends[p[-1]] += 1
+
+        spurs = set()
+        for i, p in enumerate(paths):
+            if len(p) < spur_length and p[0] != p[-1]:
+                a, b = ends[p[0]], ends[p[-1]]
+                if (a == 1 and b >= 3) or (b == 1 and a >= 3):
+                    spurs.add(i)
+        if not spurs:
+            break
+        paths = [p for i, p in enumerate(paths) if i not in spurs]
+
+    # Join chains through nodes where exactly two path ends meet
+    ends_at = {}
+    for i, p in enumerate(paths):
+        if p[0] != p[-1]:
+            ends_at.setdefault(p[0], []).append((i, 0))
+            ends_at.setdefault(p[-1], []).append((i, 1))
+
+    partner = {}
+    for owners in ends_at.values():
+        if len(owners) == 2 and owners[0][0] != owners[1][0]:
+            partner[owners[0]] = owners[1]
+            partner[owners[1]] = owners[0]
+
+    def follow(i, end):
+        # Walk from path i, leaving through the given end, until the chain stops
+        chain = paths[i][::-1] if end == 0 else list(paths[i])
+        used[i] = True
+        while (i, end) in partner:
+            i, entry = partner[(i, end)]
+            if used[i]:
+                break
+            used[i] = True
+            nxt = paths[i] if entry == 0 else paths[i][::-1]
+            chain.extend(nxt[1:])
+            end = 1 - entry
+        return chain
+
+    used = [False] * len(paths)
+    joined = []
+    for i, p in enumerate(paths):
+        if used[i] or p[0] == p[-1]:
+            continue
+        if (i, 0) not in partner:
+            joined.append(follow(i, 1))
+        elif (i, 1) not in partner:
+            joined.append(follow(i, 0))
+
+    # Anything left is a ring of chains, or a ring on its own
+    for i in range(len(paths)):
+        if not used[i]:
+            joined.append(follow(i, 1))
+
+    return joined
+
+def trace_skeleton_pixels(ys, xs, width, spur_length=10):
+    """
+    Trace skeleton pixels, given as row/column arrays, into polylines
+    Returns contours in OpenCV's (N, 1, 2) int32 layout with (x, y)
+    vertices; closed rings repeat their first vertex at the end.
+    Branches shorter than spur_length pixels that end in a free tip
+    are removed as thinning artefacts
+    """
+    if len(ys) == 0:
+        return []
+
+    paths = _prune_spurs(_walk_paths(_neighbour_table(ys, xs, width)), spur_length or 0)
+
+    points = np.column_stack([xs, ys]).astype(np.int32)
+    return [points[path].reshape(-1, 1, 2) for path in paths if len(path) >= 2]
+
+def trace_skeleton(skeleton, spur_length=10):
+    """Trace a boolean skeleton image into polylines"""
+    ys, xs = np.nonzero(skeleton)
+    return trace_skeleton_pixels(ys, xs, skeleton.shape[1], spur_length)
+
+def skeleton_tile(src, core, padded, mask_fn):
+    """Skeleton pixels of one tile that fall inside its core, in raster coordinates"""
+    mask = mask_fn(read_window_bgr(src, padded))
+    ys, xs = np.nonzero(skeletonize_mask(mask))
+
+    ys = ys + padded.row_off
+    xs = xs + padded.col_off
+    inside = ((ys >= core.row_off) & (ys < core.row_off + core.height) &
+              (xs >= core.col_off) & (xs < core.col_off + core.width))
+    return ys[inside], xs[inside]
+
+def extract_centerlines_tiled(input_path, mask_fn, tile_size=2048, overlap=16, workers=None,
+                              spur_length=10):
+    """
+    Skeletonize a raster tile by tile and trace the centerlines as a whole
+    Only skeleton pixels are kept between tiles, so memory follows the line
+    length rather than the image size. Thinning only looks about half a
+    line width past each pixel, so overlap must exceed half the thickest
+    stroke plus the reach of mask_fn's morphology
+    """
+    tiles = map_tiles(input_path, skeleton_tile, mask_fn, tile_size, overlap, workers)
+    ys = np.concatenate([t[0] for t in tiles])
+    xs = np.concatenate([t[1] for t in tiles])
+
+    width = int(xs.max()) + 1 if len(xs) else 0
+    centerlines = trace_skeleton_pixels(ys, xs, width, spur_length)
+    print(f"Traced {len(ys)} skeleton pixels into {len(centerlines)} centerlines")
+
+    return centerlines
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Tiled, windowed raster reading for red line extraction
+Builds the red mask one rasterio window at a time and traces its boundaries
+with marching squares, so memory stays bounded for any map size.
+Each tile owns a disjoint set of cells and every boundary chain that leaves a
+tile ends on a cell edge with a global id, so chains are stitched across tile
+seams by exact id lookup instead of by guessing nearby endpoints.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import cv2
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+# Default Gaussian sigma (pixels) for sub-pixel tracing; small enough that
+# one-pixel-wide strokes still rise above the half level after smoothing
+SUBPIXEL_SIGMA = 0.6
+
+# Sub-pixel chains have a vertex on every boundary cell; vertices closer than
+# this (pixels) to the simplified curve are dropped, which leaves about as
+# many vertices as OpenCV's CHAIN_APPROX_SIMPLE outlines so the extractors'
+# vertex-count filters keep their meaning
+SUBPIXEL_TOLERANCE = 0.2
+
+# Cell corners in (x, y) order: top-left, top-right, bottom-right, bottom-left
+# (case bits 1, 2, 4, 8), and the midpoints of the top, right, bottom and left
+# edges (edge codes 0, 1, 2, 3)
+_CORNERS = ((0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0))
+_EDGE_MIDPOINTS = ((0.5, 0.0), (1.0, 0.5), (0.5, 1.0), (0.0, 0.5))
+
+# Boundary segments per marching-squares case. Saddles (5 and 10) keep the
+# foreground diagonal connected, like OpenCV's 8-connected contours; cases
+# 16 and 17 are the split variants used for continuous fields
+_CASE_SEGMENTS = {
+    1: [(3, 0)], 2: [(0, 1)], 3: [(3, 1)], 4: [(1, 2)],
+    5: [(0, 1), (3, 2)], 6: [(0, 2)], 7: [(3, 2)], 8: [(2, 3)],
+    9: [(0, 2)], 10: [(3, 0), (1, 2)], 11: [(1, 2)], 12: [(3, 1)],
+    13: [(0, 1)], 14: [(3, 0)],
+    16: [(3, 0), (1, 2)], 17: [(0, 1), (3, 2)],
+}
+
+# Pixel offsets (dy, dx) of the two ends of each cell edge
+_EDGE_FROM = np.array([(0, 0), (0, 1), (1, 0), (0, 0)])
+_EDGE_TO = np.array([(0, 1), (1, 1), (1, 1), (1, 0)])
+
+def _orient_segment(case, from_edge, to_edge):
+    """Orient a case segment so foreground always lies on the same side"""
+    ax, ay = _EDGE_MIDPOINTS[from_edge]
+    bx, by = _EDGE_MIDPOINTS[to_edge]
+    mx, my = (ax + bx) / 2, (ay + by) / 2
+
+    # The nearest corner is the one the segment cuts off
+    corner = min(range(4), key=lambda k: (_CORNERS[k][0] - mx)**2 + (_CORNERS[k][1] - my)**2)
+    cx, cy = _CORNERS[corner]
+    cross = (bx - ax) * (cy - my) - (by - ay) * (cx - mx)
+
+    foreground_bits = {16: 5, 17: 10}.get(case, case)
+    is_foreground = bool(foreground_bits & (1 << corner))
+
+    if (cross > 0) == is_foreground:
+        return from_edge, to_edge
+    return to_edge, from_edge
+
+def _build_case_tables():
+    """Build the vectorised lookup tables for the marching-squares cases"""
+    counts = np.zeros(18, np.intp)
+    seg_from = np.zeros((18, 2), np.intp)
+    seg_to = np.zeros((18, 2), np.intp)
+    for case, segments in _CASE_SEGMENTS.items():
+        counts[case] = len(segments)
+        for slot, (from_edge, to_edge) in enumerate(segments):
+            seg_from[case, slot], seg_to[case, slot] = _orient_segment(case, from_edge, to_edge)
+    return counts, seg_from, seg_to
+
+_SEG_COUNT, _SEG_FROM, _SEG_TO = _build_case_tables()
+
+def _edge_ids(ys, xs, edges, width):
+    """Global ids for cell edges; shared edges get the same id from both cells"""
+    stride = width + 2
+    dy = _EDGE_FROM[edges, 0]
+    dx = _EDGE_FROM[edges, 1]
+    node = (ys + dy + 1) * stride + (xs + dx + 1)
+    vertical = (edges == 1) | (edges == 3)
+    return 2 * node.astype(np.int64) + vertical
+
+def _edge_points(values, iys, ixs, edges, level, x0, y0):
+    """Interpolated crossing points on cell edges, in global pixel coordinates"""
+    from_dy, from_dx = _EDGE_FROM[edges, 0], _EDGE_FROM[edges, 1]
+    to_dy, to_dx = _EDGE_TO[edges, 0], _EDGE_TO[edges, 1]
+    a = values[iys + from_dy, ixs + from_dx].astype(np.float64)
+    b = values[iys + to_dy, ixs + to_dx].astype(np.float64)
+    t = (level - a) / (b - a)
+
+    xs = (x0 + ixs + from_dx).astype(np.float64) + t * (to_dx - from_dx)
+    ys = (y0 + iys + from_dy).astype(np.float64) + t * (to_dy - from_dy)
+    return np.column_stack((xs, ys))
+
+def trace_cells(values, level, x0, y0, width, split_saddles=False):
+    """
+    Trace boundary chains through the cells of a pixel block
+    values holds pixels (y0..y0+rows, x0..x0+cols) and each cell's top-left
+    pixel is (y0 + i, x0 + j). Returns (points, start_edge, end_edge) chains;
+    closed chains have start_edge None
+    """
+    above = values > level
+    code = (above[:-1, :-1] * 1 + above[:-1, 1:] * 2 +
+            above[1:, 1:] * 4 + above[1:, :-1] * 8).astype(np.intp)
+    iys, ixs = np.nonzero((code != 0) & (code != 15))
+    cases = code[iys, ixs]
+
+    if split_saddles:
+        # Continuous fields: a low centre separates the saddle diagonals
+        centre = (values[iys, ixs].astype(np.float64) + values[iys, ixs + 1] +
+                  values[iys + 1, ixs + 1] + values[iys + 1, ixs]) / 4
+        low = centre <= level
+        cases = np.where(low & (cases == 5), 16, cases)
+        cases = np.where(low & (cases == 10), 17, cases)
+
+    # One segment per boundary cell, two for saddles
+    cells = np.concatenate((np.arange(len(cases)), np.nonzero(_SEG_COUNT[cases] == 2)[0]))
+    slots = np.concatenate((np.zeros(len(cases), np.intp), np.ones(len(cells) - len(cases), np.intp)))
+    seg_cases = cases[cells]
+    from_edges = _SEG_FROM[seg_cases, slots]
+    to_edges = _SEG_TO[seg_cases, slots]
+    seg_iy, seg_ix = iys[cells], ixs[cells]
+
+    from_ids = _edge_ids(y0 + seg_iy, x0 + seg_ix, from_edges, width)
+    to_ids = _edge_ids(y0 + seg_iy, x0 + seg_ix, to_edges, width)
+    from_points = _edge_points(values, seg_iy, seg_ix, from_edges, level, x0, y0)
+    to_points = _edge_points(values, seg_iy, seg_ix, to_edges, level, x0, y0)
+
+    # Link each segment to the one starting where it ends
+    count = len(cells)
+    next_array = np.full(count, -1, np.intp)
+    if count:
+        order = np.argsort(from_ids)
+        sorted_ids = from_ids[order]
+        position = np.searchsorted(sorted_ids, to_ids).clip(0, count - 1)
+        next_array = np.where(sorted_ids[position] == to_ids, order[position], -1)
+    has_previous = np.zeros(count, bool)
+    has_previous[next_array[next_array >= 0]] = True
+    next_segment = next_array.tolist()
+
+    chains = []
+    visited = [False] * count
+
+    def walk(start):
+        indices = [start]
+        visited[start] = True
+        current = next_segment[start]
+        while current != -1 and not visited[current]:
+            indices.append(current)
+            visited[current] = True
+            current = next_segment[current]
+        return indices
+
+    # Open chains run into a neighbouring tile; walk those first
+    for start in np.nonzero(~has_previous)[0].tolist():
+        indices = walk(start)
+        points = np.vstack((from_points[indices], to_points[indices[-1]]))
+        chains.append((points, int(from_ids[start]), int(to_ids[indices[-1]])))
+
+    for start in range(count):
+        if not visited[start]:
+            indices = walk(start)
+            chains.append((from_points[indices], None, None))
+
+    return chains
+
+def iter_tile_windows(width, height, tile_size=2048, overlap=16):
+    """Yield (core, padded) windows covering the raster in row-major order"""
+    for row_off in range(0, height, tile_size):
+        for col_off in range(0, width, tile_size):
+            core_width = min(tile_size, width - col_off)
+            core_height = min(tile_size, height - row_off)
+            core = Window(col_off, row_off, core_width, core_height)
+
+            # The padded window adds context so morphology near the seam
+            # sees the same neighbourhood it would in the full image
+            pad_col = max(0, col_off - overlap)
+            pad_row = max(0, row_off - overlap)
+            pad_col_end = min(width, col_off + core_width + overlap)
+            pad_row_end = min(height, row_off + core_height + overlap)
+            padded = Window(pad_col, pad_row, pad_col_end - pad_col, pad_row_end - pad_row)
+
+            yield core, padded
+
+def read_window_bgr(src, window=None, out_shape=None):
+    """
+    Read a window as an 8-bit BGR array, matching what cv2.imread returns
+    out_shape=(height, width) reads it decimated (nearest neighbour, so
+    palette indices stay valid), using the file's overviews when it has any
+    """
+    if out_shape is not None:
+        out_shape = (src.count,) + tuple(out_shape)
+    data = src.read(window=window, out_shape=out_shape)
+
+    if data.dtype == np.uint16:
+        data = (data >> 8).astype(np.uint8)
+
+    if src.count >= 3:
+        return np.dstack((data[2], data[1], data[0]))
+
+    # Single band: expand a palette if there is one, otherwise treat as gray
+    try:
+        colormap = src.colormap(1)
+    except ValueError:
+        return np.dstack((data[0], data[0], data[0]))
+
+    palette = np.zeros((256, 3), np.uint8)
+    for index, color in colormap.items():
+        if index < 256:
+            palette[index] = color[2], color[1], color[0]
+    return palette[data[0]]
+
+def tile_cell_block(tile_values, core, padded, width, height):
+    """
+    Cut the pixel block holding the cells a tile owns out of its padded data
+    Tiles on the map border also own the cells that straddle the border,
+    which see background outside the image so every contour closes
+    """
+    col_off, row_off = int(core.col_off), int(core.row_off)
+    cell_x0 = col_off - 1 if col_off == 0 else col_off
+    cell_y0 = row_off - 1 if row_off == 0 else row_off
+    cell_x1 = col_off + int(core.width)
+    cell_y1 = row_off + int(core.height)
+
+    # Pixels cell_x0..cell_x1 and cell_y0..cell_y1, zero outside the image
+    block = np.zeros((cell_y1 - cell_y0 + 1, cell_x1 - cell_x0 + 1), tile_values.dtype)
+    src_x0, src_y0 = max(cell_x0, 0), max(cell_y0, 0)
+    src_x1, src_y1 = min(cell_x1, width - 1), min(cell_y1, height - 1)
+    pad_x, pad_y = int(padded.col_off), int(padded.row_off)
+    block[src_y0 - cell_y0:src_y1 - cell_y0 + 1, src_x0 - cell_x0:src_x1 - cell_x0 + 1] = \
+        tile_values[src_y0 - pad_y:src_y1 - pad_y + 1, src_x0 - pad_x:src_x1 - pad_x + 1]
+
+    return block, cell_x0, cell_y0
+
+def subpixel_field(mask, sigma):
+    """
+    Gaussian-smoothed float copy of a binary mask
+    Tracing this at the half level puts vertices on a smooth sub-pixel
+    curve instead of on pixel-edge midpoints
+    """
+    return cv2.GaussianBlur(mask.astype(np.float32), (0, 0), sigma)
+
+def trace_tile(src, core, padded, mask_fn, sigma=None):
+    """Build the mask for one tile and trace the boundary chains of its cells"""
+    mask = mask_fn(read_window_bgr(src, padded))
+    if sigma:
+        mask = subpixel_field(mask, sigma)
+    block, cell_x0, cell_y0 = tile_cell_block(mask, core, padded, src.width, src.height)
+    return trace_cells(block, 127.5, cell_x0, cell_y0, src.width, split_saddles=bool(sigma))
+
+# Per-process state for parallel tile tracing
+_worker_src = None
+_worker_mask_fn = None
+
+def _init_tile_worker(input_path, mask_fn):
+    """Open the raster once per worker process"""
+    global _worker_src, _worker_mask_fn
+
+    # One OpenCV thread per process, otherwise workers oversubscribe the cores
+    cv2.setNumThreads(1)
+    _worker_src = rasterio.open(input_path)
+    _worker_mask_fn = mask_fn
+
+def _run_tile_task(task):
+    """Run tile_fn on one tile inside a worker process"""
+    tile_fn, core, padded = task
+    return tile_fn(_worker_src, core, padded, _worker_mask_fn)
+
+def map_tiles(input_path, tile_fn, mask_fn, tile_size=2048, overlap=16, workers=None):
+    """
+    Call tile_fn(src, core, padded, mask_fn) for every tile of the raster
+    Returns the per-tile results in row-major tile order. With workers > 1
+    tiles run in a process pool, one tile per task; tile_fn and mask_fn
+    must then be picklable (module-level functions)
+    """
+    with rasterio.open(input_path) as src:
+        windows = list(iter_tile_windows(src.width, src.height, tile_size, max(overlap, 1)))
+        print(f"Processing {len(windows)} tiles of up to {tile_size}px (overlap {overlap}px)")
+
+        if not workers or workers <= 1:
+            return [tile_fn(src, core, padded, mask_fn) for core, padded in windows]
+
+    print(f"Using {workers} worker processes")
+    tasks = [(tile_fn, core, padded) for core, padded in windows]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_tile_worker,
+                             initargs=(input_path, mask_fn)) as executor:
+        return list(executor.map(_run_tile_task, tasks))
+
+def stitch_fragments(fragments):
+    """
+    Join boundary chains from all tiles into closed contours
+    Open chains are joined where one ends on the edge the next starts on
+    """
+    contours = [points for points, start, _ in fragments if start is None]
+    open_fragments = [fragment for fragment in fragments if fragment[1] is not None]
+
+    by_start = {start: i for i, (_, start, _) in enumerate(open_fragments)}
+    ends = {end for _, _, end in open_fragments}
+    visited = [False] * len(open_fragments)
+
+    def walk(first):
+        pieces = [open_fragments[first][0]]
+        visited[first] = True
+        current = by_start.get(open_fragments[first][2])
+        while current is not None and not visited[current]:
+            # Consecutive chains share the crossing point on the seam edge
+            pieces.append(open_fragments[current][0][1:])
+            visited[current] = True
+            current = by_start.get(open_fragments[current][2])
+        points = np.concatenate(pieces)
+        if current is not None:
+            points = points[:-1]
+        return points
+
+    for i, (_, start, _) in enumerate(open_fragments):
+        if not visited[i] and start not in ends:
+            contours.append(walk(i))
+
+    for i in range(len(open_fragments)):
+        if not visited[i]:
+            contours.append(walk(i))
+
+    return contours
+
+def compress_collinear(points):
+    """Drop vertices in the middle of straight runs of a closed contour"""
+    if len(points) < 3:
+        return points
+
+    incoming = points - np.roll(points, 1, axis=0)
+    outgoing = np.roll(points, -1, axis=0) - points
+    cross = incoming[:, 0] * outgoing[:, 1] - incoming[:, 1] * outgoing[:, 0]
+    dot = (incoming * outgoing).sum(axis=1)
+    keep = (cross != 0) | (dot <= 0)
+
+    return points[keep] if keep.any() else points[:1]
+
+def signed_area(points):
+    """Shoelace area; outer boundaries are positive, holes negative"""
+    x, y = points[:, 0], points[:, 1]
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+def finish_contours(fragments, external_only=False, subpixel=False):
+    """Stitch chains into OpenCV-layout (N, 1, 2) float32 contours"""
+    contours = []
+    for points in stitch_fragments(fragments):
+        if external_only and signed_area(points) < 0:
+            continue
+        if subpixel:
+            contour = points.astype(np.float32).reshape(-1, 1, 2)
+            contours.append(cv2.approxPolyDP(contour, SUBPIXEL_TOLERANCE, True))
+        else:
+            contours.append(compress_collinear(points).astype(np.float32).reshape(-1, 1, 2))
+
+    return contours
+
+def trace_mask(mask, sigma=None, external_only=False):
+    """
+    Trace the contours of an in-memory mask with marching squares
+    With sigma the mask is smoothed first and the vertices are sub-pixel
+    """
+    height, width = mask.shape[:2]
+    full = Window(0, 0, width, height)
+    values = subpixel_field(mask, sigma) if sigma else mask
+    block, cell_x0, cell_y0 = tile_cell_block(values, full, full, width, height)
+    chains = trace_cells(block, 127.5, cell_x0, cell_y0, width, split_saddles=bool(sigma))
+
+    return finish_contours(chains, external_only, subpixel=bool(sigma))
+
+def extract_contours_tiled(input_path, mask_fn, tile_size=2048, overlap=16,
+                           external_only=False, workers=None, sigma=None):
+    """
+    Trace red line contours from a raster without loading it whole
+    mask_fn maps a BGR tile to a binary mask; overlap must cover the reach
+    of any morphology it applies. Contours come back in OpenCV's (N, 1, 2)
+    layout as float32, with vertices on pixel-edge midpoints, or on a
+    sub-pixel curve when sigma smooths the mask first (overlap must then
+    also cover about 4 * sigma).
+    With workers > 1 tiles are traced in a process pool, one tile per task;
+    mask_fn must then be picklable (a module-level function). Results are
+    collected in tile order, so the output matches the serial run exactly
+    """
+    tile_fn = partial(trace_tile, sigma=sigma) if sigma else trace_tile
+
+    fragments = []
+    for tile_fragments in map_tiles(input_path, tile_fn, mask_fn, tile_size, overlap, workers):
+        fragments.extend(tile_fragments)
+
+    contours = finish_contours(fragments, external_only, subpixel=bool(sigma))
+
+    print(f"Stitched {len(fragments)} tile fragments into {len(contours)} contours")
+
+    return contours
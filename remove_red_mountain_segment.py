@@ -5,16 +5,11 @@ Remove the red line segment that overlaps with Red Mountain
 
 import json
 
-def remove_red_mountain_segment():
+def remove_red_mountain(features):
+    """Pipeline stage: drop segments whose bounding box holds Red Mountain"""
     # Red Mountain location
     red_mountain = [-129.7223, 55.9787]
     
-    # Read the current data
-    with open('public/images/fiji-goliath-red-line-final.geojson', 'r') as f:
-        geojson = json.load(f)
-    
-    features = geojson['features']
-    
     print(f"Current segments ({len(features)} total):")
     
     # Keep only segments that don't overlap with Red Mountain
@@ -42,10 +37,17 @@ def remove_red_mountain_segment():
     
     print(f"\nFinal segments ({len(kept_segments)} total)")
     
+    return kept_segments
+
+def remove_red_mountain_segment():
+    # Read the current data
+    with open('public/images/fiji-goliath-red-line-final.geojson', 'r') as f:
+        geojson = json.load(f)
+    
     # Save the cleaned data
     output_geojson = {
         "type": "FeatureCollection",
-        "features": kept_segments
+        "features": remove_red_mountain(geojson['features'])
     }
     
     # Create a new file without the Red Mountain segment
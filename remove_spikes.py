@@ -5,6 +5,11 @@ Remove spiky artifacts from the red line using smoothing and outlier detection
 
 import json
 import math
+import numpy as np
+from geo_transforms import lines_to_lonlat, lines_to_metric
+from line_despike import outlier_mask, spike_mask
+from line_simplify import simplify_line
+from line_smoothing import smooth_coords
 
 def distance_between_points(p1, p2):
     """Calculate distance between two points"""
@@ -44,11 +49,20 @@ def detect_spike(p1, p2, p3, angle_threshold=45):
     # A spike is a sharp turn (angle < threshold degrees)
     return angle < angle_threshold
 
-def remove_spikes_from_line(coords, angle_threshold=30):
-    """Remove spikes from a line by detecting sharp angles"""
+def remove_spikes_from_line(coords, angle_threshold=30, batch=False, max_offset=None):
+    """
+    Remove spikes from a line by detecting sharp angles
+    batch=True tests every point at once and repeats until nothing changes,
+    never moving the line by max_offset (required, in coordinate units) or more
+    """
     if len(coords) < 3:
         return coords
     
+    if batch:
+        if max_offset is None:
+            raise ValueError("batch spike removal needs max_offset")
+        return [coords[i] for i in np.flatnonzero(spike_mask(coords, max_offset, angle_threshold))]
+    
     cleaned = [coords[0]]
     
     i = 1
@@ -67,88 +81,17 @@ def remove_spikes_from_line(coords, angle_threshold=30):
     
     return cleaned
 
-def smooth_line(coords, window_size=5):
-    """Apply moving average smoothing"""
-    if len(coords) <= window_size:
-        return coords
-    
-    smoothed = []
-    half_window = window_size // 2
-    
-    for i in range(len(coords)):
-        start = max(0, i - half_window)
-        end = min(len(coords), i + half_window + 1)
-        
-        window_points = coords[start:end]
-        
-        # Calculate weighted average (center point has more weight)
-        weights = []
-        for j in range(len(window_points)):
-            distance_from_center = abs(j - len(window_points)//2)
-            weight = 1.0 / (1.0 + distance_from_center * 0.5)
-            weights.append(weight)
-        
-        total_weight = sum(weights)
-        
-        avg_lon = sum(p[0] * w for p, w in zip(window_points, weights)) / total_weight
-        avg_lat = sum(p[1] * w for p, w in zip(window_points, weights)) / total_weight
-        
-        smoothed.append([avg_lon, avg_lat])
-    
-    return smoothed
-
-def douglas_peucker_simplify(coords, epsilon=0.0001):
-    """Simplify line using Douglas-Peucker algorithm"""
-    if len(coords) <= 2:
-        return coords
-    
-    # Find the point with maximum distance from line between first and last
-    start = coords[0]
-    end = coords[-1]
-    
-    max_dist = 0
-    max_idx = 0
-    
-    for i in range(1, len(coords) - 1):
-        dist = perpendicular_distance(coords[i], start, end)
-        if dist > max_dist:
-            max_dist = dist
-            max_idx = i
-    
-    # If max distance is greater than epsilon, recursively simplify
-    if max_dist > epsilon:
-        # Recursive simplification
-        left_line = douglas_peucker_simplify(coords[:max_idx+1], epsilon)
-        right_line = douglas_peucker_simplify(coords[max_idx:], epsilon)
-        
-        # Combine results (avoid duplicating the middle point)
-        return left_line[:-1] + right_line
-    else:
-        # All points between can be removed
-        return [start, end]
-
-def perpendicular_distance(point, line_start, line_end):
-    """Calculate perpendicular distance from point to line"""
-    x0, y0 = point
-    x1, y1 = line_start
-    x2, y2 = line_end
-    
-    # Line length
-    line_length = distance_between_points(line_start, line_end)
-    
-    if line_length == 0:
-        return distance_between_points(point, line_start)
-    
-    # Calculate perpendicular distance using cross product
-    # |(x2-x1)(y1-y0) - (x1-x0)(y2-y1)| / line_length
-    numerator = abs((x2-x1)*(y1-y0) - (x1-x0)*(y2-y1))
-    return numerator / line_length
-
-def remove_outliers(coords, threshold=3):
-    """Remove points that deviate too much from their neighbors"""
+def remove_outliers(coords, threshold=3, batch=False):
+    """
+    Remove points that deviate too much from their neighbors
+    batch=True tests every point at once and repeats until nothing changes
+    """
     if len(coords) < 5:
         return coords
     
+    if batch:
+        return [coords[i] for i in np.flatnonzero(outlier_mask(coords, threshold))]
+    
     cleaned = [coords[0]]
     
     for i in range(1, len(coords) - 1):
@@ -175,45 +118,59 @@ def remove_outliers(coords, threshold=3):
     cleaned.append(coords[-1])
     return cleaned
 
-def process_red_line():
-    # Load the current red line data
-    with open('public/images/fiji-goliath-red-line-final.geojson', 'r') as f:
-        data = json.load(f)
-    
-    print(f"Processing {len(data['features'])} segments to remove spikes...")
+def despike_features(features):
+    """Pipeline stage: despike, drop outliers, smooth and simplify every segment"""
+    print(f"Processing {len(features)} segments to remove spikes...")
     print()
     
     processed_features = []
+    processed_coords = []
     
-    for i, feature in enumerate(data['features']):
-        coords = feature['geometry']['coordinates']
+    # Work in meters; lines go back to lon/lat only at the end
+    metric = lines_to_metric([feature['geometry']['coordinates'] for feature in features])
+    
+    for i, (feature, coords) in enumerate(zip(features, metric)):
         original_count = len(coords)
         
         print(f"Segment {i+1}: {original_count} points")
         
         # Step 1: Remove obvious spikes (sharp angles)
-        despike = remove_spikes_from_line(coords, angle_threshold=30)
+        despike = remove_spikes_from_line(coords, angle_threshold=30, batch=True, max_offset=20)
         print(f"  After despike: {len(despike)} points (removed {original_count - len(despike)} spikes)")
         
         # Step 2: Remove outliers
-        no_outliers = remove_outliers(despike, threshold=2)
+        no_outliers = remove_outliers(despike, threshold=2, batch=True)
         print(f"  After outlier removal: {len(no_outliers)} points")
         
         # Step 3: Smooth the line
-        smoothed = smooth_line(no_outliers, window_size=7)
+        smoothed = smooth_coords(no_outliers, window=7, kind='weighted')
         print(f"  After smoothing: {len(smoothed)} points")
         
         # Step 4: Simplify to remove redundant points
-        simplified = douglas_peucker_simplify(smoothed, epsilon=0.0002)
+        # (distances to the infinite line through each span's chord)
+        simplified = simplify_line(smoothed, epsilon=20, segment=False)
         print(f"  After simplification: {len(simplified)} points")
         
         # Final smoothing pass with smaller window
-        final = smooth_line(simplified, window_size=3)
+        final = smooth_coords(simplified, window=3, kind='weighted')
         print(f"  Final: {len(final)} points (reduced by {((original_count - len(final))/original_count*100):.1f}%)")
         print()
         
-        feature['geometry']['coordinates'] = final
         processed_features.append(feature)
+        processed_coords.append(final)
+    
+    for feature, coords in zip(processed_features, lines_to_lonlat(processed_coords)):
+        feature['geometry']['coordinates'] = coords
+    
+    return processed_features
+
+def process_red_line():
+    # Load the current red line data
+    with open('public/images/fiji-goliath-red-line-final.geojson', 'r') as f:
+        data = json.load(f)
+    
+    total_original = sum(len(f['geometry']['coordinates']) for f in data['features'])
+    processed_features = despike_features(data['features'])
     
     # Save result
     output = {
@@ -234,7 +191,6 @@ def process_red_line():
     print("Updated fiji-goliath-red-line-final.geojson")
     
     # Summary
-    total_original = sum(len(f['geometry']['coordinates']) for f in data['features'])
     total_final = sum(len(f['geometry']['coordinates']) for f in processed_features)
     print(f"\nTotal points: {total_original} -> {total_final} ({((total_original - total_final)/total_original*100):.1f}% reduction)")
 
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Endpoint graph for chaining red line segments across gaps
+Candidate links between segment endpoints come from the endpoint grid, and
+chaining is solved as a minimum-gap path cover: links are taken shortest
+first, each endpoint is used at most once and no link may close a loop.
+How a gap is bridged is a parameter, so each gap-fixing script only picks
+its thresholds and bridge policy
+"""
+
+import math
+
+from segment_index import EndpointGrid, UnionFind
+
+ENDS = ('start', 'end')
+
+def distance_between_points(p1, p2):
+    """Calculate distance between two points"""
+    return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
+
+def endpoint(coords, end):
+    """First ('start') or last ('end') point of a coordinate list"""
+    return coords[0] if end == 'start' else coords[-1]
+
+def endpoint_gap(coords1, coords2):
+    """
+    Smallest distance between the endpoints of two segments
+    Returns (distance, end1, end2), ends being 'start' or 'end'
+    """
+    return min(
+        (distance_between_points(endpoint(coords1, end1), endpoint(coords2, end2)), end1, end2)
+        for end1 in ENDS for end2 in ENDS
+    )
+
+def interpolate_points(p1, p2, num_points=5):
+    """Create interpolated points between two points (num_points - 1 of them)"""
+    points = []
+    for i in range(1, num_points):
+        t = i / num_points
+        lon = p1[0] + (p2[0] - p1[0]) * t
+        lat = p1[1] + (p2[1] - p1[1]) * t
+        points.append([lon, lat])
+    return points
+
+def spaced_bridge(spacing, min_gap=0):
+    """Bridge policy: points about every `spacing` coordinate units, none for gaps under min_gap"""
+    def bridge(p1, p2):
+        distance = distance_between_points(p1, p2)
+        if distance <= min_gap:
+            return []
+        return interpolate_points(p1, p2, max(2, int(distance / spacing)))
+    return bridge
+
+def fixed_bridge(num_points):
+    """Bridge policy: the same number of interpolated steps for every gap"""
+    def bridge(p1, p2):
+        return interpolate_points(p1, p2, num_points)
+    return bridge
+
+def candidate_links(segments, max_gap=None):
+    """
+    Every endpoint pair of two different segments closer than max_gap
+    Returns (distance, i, end_i, j, end_j) tuples sorted by distance. With
+    an endpoint grid this is near-linear; max_gap=None compares all pairs
+    """
+    links = []
+
+    if max_gap is None:
+        for i in range(len(segments)):
+            for j in range(i + 1, len(segments)):
+                for end_i in ENDS:
+                    for end_j in ENDS:
+                        p, q = endpoint(segments[i], end_i), endpoint(segments[j], end_j)
+                        links.append((distance_between_points(p, q), i, end_i, j, end_j))
+    else:
+        grid = EndpointGrid(max_gap)
+        for i, coords in enumerate(segments):
+            for end_i in ENDS:
+                point = endpoint(coords, end_i)
+                for j, end_j in grid.query(point, max_gap):
+                    links.append((distance_between_points(point, endpoint(segments[j], end_j)),
+                                  j, end_j, i, end_i))
+            for end_i in ENDS:
+                grid.insert((i, end_i), endpoint(coords, end_i))
+
+    links.sort(key=lambda link: link[0])
+    return links
+
+def chain_segments(segments, max_gap=None, bridge=None, max_joins=None):
+    """
+    Stitch segments into polylines across the smallest gaps first
+    segments is a list of coordinate lists. Links no longer than max_gap
+    are accepted shortest first while both endpoints are still free and the
+    two segments are not already in one chain, up to max_joins links.
+    bridge(p1, p2) returns the points inserted across a gap (none by
+    default). Returns (coords, members, links) triples, members being the
+    segment indices of each chain in order and links the (distance,
+    end_a, end_b) of each join between consecutive members; unlinked
+    segments come back alone
+    """
+    chains = UnionFind(len(segments))
+    linked = {}
+    gaps = {}
+    joins = 0
+
+    for distance, i, end_i, j, end_j in candidate_links(segments, max_gap):
+        if max_joins is not None and joins >= max_joins:
+            break
+        if (i, end_i) in linked or (j, end_j) in linked or chains.find(i) == chains.find(j):
+            continue
+        linked[(i, end_i)] = (j, end_j)
+        linked[(j, end_j)] = (i, end_i)
+        gaps[(i, end_i)] = gaps[(j, end_j)] = distance
+        chains.union(i, j)
+        joins += 1
+
+    def walk(first, free_end):
+        # Enter at the free end and follow links out of the other end
+        coords, members, links = [], [], []
+        index, entry = first, free_end
+        while True:
+            segment = segments[index]
+            oriented = list(segment) if entry == 'start' else list(reversed(segment))
+            if coords and bridge is not None:
+                coords.extend(bridge(coords[-1], oriented[0]))
+            coords.extend(oriented)
+            members.append(index)
+
+            exit_end = 'end' if entry == 'start' else 'start'
+            if (index, exit_end) not in linked:
+                return coords, members, links
+            distance = gaps[(index, exit_end)]
+            index, entry = linked[(index, exit_end)]
+            links.append((distance, exit_end, entry))
+
+    # Links never close a loop, so every chain has two free ends
+    result = []
+    visited = set()
+    for i in range(len(segments)):
+        if i in visited:
+            continue
+        free_end = 'start' if (i, 'start') not in linked else 'end'
+        if (i, free_end) in linked:
+            continue  # Interior of a chain; reached from one of its ends
+        coords, members, links = walk(i, free_end)
+        visited.update(members)
+        result.append((coords, members, links))
+
+    return result
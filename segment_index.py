@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Spatial index of segment endpoints and union-find connectivity
+Endpoints are bucketed into a uniform grid whose cells are as large as the
+connection threshold, so finding the endpoints near a point only looks at
+the 3x3 block of cells around it. Connected groups of segments are then
+solved with union-find in a single pass instead of repeated all-pairs scans
+"""
+
+import math
+
+class UnionFind:
+    """Disjoint sets over the integers 0..n-1"""
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, i):
+        # Path halving keeps the trees flat
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        i, j = self.find(i), self.find(j)
+        if i == j:
+            return i
+        if self.size[i] < self.size[j]:
+            i, j = j, i
+        self.parent[j] = i
+        self.size[i] += self.size[j]
+        return i
+
+class EndpointGrid:
+    """Uniform grid of points, each stored with a key"""
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def _cell(self, point):
+        return (math.floor(point[0] / self.cell_size), math.floor(point[1] / self.cell_size))
+
+    def insert(self, key, point):
+        self.cells.setdefault(self._cell(point), []).append((key, point[0], point[1]))
+
+    def query(self, point, radius):
+        """Keys of stored points closer than radius (radius <= cell_size)"""
+        cx, cy = self._cell(point)
+        radius_sq = radius * radius
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for key, x, y in self.cells.get((cx + dx, cy + dy), ()):
+                    if (x - point[0]) ** 2 + (y - point[1]) ** 2 < radius_sq:
+                        yield key
+
+def connect_segments(segments, threshold):
+    """
+    Group segments whose endpoints lie closer than threshold
+    segments is a list of coordinate lists. Returns a UnionFind over their
+    indices; two segments are in the same set when a chain of endpoint
+    connections links them
+    """
+    groups = UnionFind(len(segments))
+    grid = EndpointGrid(threshold)
+
+    for i, coords in enumerate(segments):
+        endpoints = (coords[0], coords[-1])
+        for point in endpoints:
+            for j in grid.query(point, threshold):
+                groups.union(i, j)
+        for point in endpoints:
+            grid.insert(i, point)
+
+    return groups
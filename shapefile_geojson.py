@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Bulk shapefile to GeoJSON conversion
+All vertices of a shapefile are gathered into one flat NumPy buffer with
+part and shape offsets, reprojected with a single pyproj call, and then
+sliced straight into GeoJSON geometries, instead of transforming and
+appending one vertex at a time. Shape records are streamed with
+iterShapeRecords and converted a batch at a time, so memory stays flat
+however large the layer. With an area of interest, only the shapes whose
+bounding boxes (read through the .shx index) meet it are parsed at all,
+and of those only the ones whose lon/lat extent meets it are kept
+"""
+
+import datetime
+import json
+import os
+import struct
+import textwrap
+
+import numpy as np
+import shapefile
+
+from geo_transforms import DEFAULT_SHAPEFILE_CRS, METRIC_CRS, get_transformer, lonlat_bounds_to, read_prj
+
+# Shape records converted (and reprojected) per call when streaming
+BATCH_SIZE = 1000
+
+# pyshp shape type -> GeoJSON geometry family (Z and M variants included)
+GEOMETRY_FAMILIES = {
+    shapefile.POINT: "point", shapefile.POINTZ: "point", shapefile.POINTM: "point",
+    shapefile.MULTIPOINT: "point", shapefile.MULTIPOINTZ: "point", shapefile.MULTIPOINTM: "point",
+    shapefile.POLYLINE: "line", shapefile.POLYLINEZ: "line", shapefile.POLYLINEM: "line",
+    shapefile.POLYGON: "polygon", shapefile.POLYGONZ: "polygon", shapefile.POLYGONM: "polygon",
+}
+
+def shapefile_crs(shapefile_path):
+    """
+    CRS from the shapefile's .prj
+    Shapefiles without one fall back to DEFAULT_SHAPEFILE_CRS with a warning
+    """
+    crs = read_prj(os.path.splitext(shapefile_path)[0] + ".prj")
+    if crs is None:
+        print(f"Warning: {os.path.basename(shapefile_path)} has no .prj, assuming {DEFAULT_SHAPEFILE_CRS}")
+        crs = DEFAULT_SHAPEFILE_CRS
+    return crs
+
+def shapes_to_buffer(shapes):
+    """
+    Flatten shapes into one (N, 2) vertex array
+    Returns (xy, part_offsets, shape_offsets): part k holds
+    xy[part_offsets[k]:part_offsets[k + 1]] and shape i holds parts
+    shape_offsets[i] to shape_offsets[i + 1]. Points and multipoints
+    count each vertex as a part of its own
+    """
+    arrays = []
+    part_starts = []
+    shape_offsets = [0]
+    total = 0
+
+    for shape in shapes:
+        count = len(shape.points)
+        if count:
+            arrays.append(np.asarray(shape.points, dtype=np.float64).reshape(count, -1)[:, :2])
+            if GEOMETRY_FAMILIES.get(shape.shapeType) == "point":
+                part_starts.extend(range(total, total + count))
+            else:
+                part_starts.extend(total + start for start in shape.parts)
+        shape_offsets.append(len(part_starts))
+        total += count
+
+    xy = np.concatenate(arrays) if arrays else np.empty((0, 2))
+    return xy, part_starts + [total], shape_offsets
+
+def reproject_buffer(xy, src_crs=METRIC_CRS, dst_crs="EPSG:4326"):
+    """
+    Reproject a flat (N, 2) vertex array in one pyproj call
+    src_crs=None means the vertices are already in dst_crs
+    """
+    if src_crs is None or len(xy) == 0:
+        return xy
+    xs, ys = get_transformer(src_crs, dst_crs).transform(xy[:, 0], xy[:, 1])
+    return np.column_stack([xs, ys])
+
+def buffer_geometries(shape_types, xy, part_offsets, shape_offsets):
+    """
+    GeoJSON geometry (or None for null shapes) for each shape in a buffer
+    Polygon rings are kept in shapefile order as the rings of one Polygon,
+    which is how the property scripts have always written them
+    """
+    coords = xy.tolist()
+    parts = [coords[start:end] for start, end in zip(part_offsets[:-1], part_offsets[1:])]
+
+    geometries = []
+    for shape_type, first, last in zip(shape_types, shape_offsets[:-1], shape_offsets[1:]):
+        family = GEOMETRY_FAMILIES.get(shape_type)
+        shape_parts = parts[first:last]
+        if family is None or not shape_parts:
+            geometries.append(None)
+        elif family == "polygon":
+            geometries.append({"type": "Polygon", "coordinates": shape_parts})
+        elif family == "line":
+            if len(shape_parts) == 1:
+                geometries.append({"type": "LineString", "coordinates": shape_parts[0]})
+            else:
+                geometries.append({"type": "MultiLineString", "coordinates": shape_parts})
+        elif shape_type in (shapefile.POINT, shapefile.POINTZ, shapefile.POINTM):
+            geometries.append({"type": "Point", "coordinates": shape_parts[0][0]})
+        else:
+            geometries.append({"type": "MultiPoint", "coordinates": [part[0] for part in shape_parts]})
+    return geometries
+
+def json_value(value):
+    """DBF attribute as a JSON-serializable value"""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return value
+
+def record_properties(fields, record):
+    """DBF record as a dict of field name -> JSON value"""
+    return {name: json_value(value) for name, value in zip(fields, record)}
+
+def buffer_extents(xy, part_offsets, shape_offsets):
+    """(N, 4) xmin, ymin, xmax, ymax of each shape's vertices in a buffer; NaN for null shapes"""
+    starts = np.asarray(part_offsets)[np.asarray(shape_offsets)]
+    counts = np.diff(starts)
+    extents = np.full((len(counts), 4), np.nan)
+    nonempty = counts > 0
+    if nonempty.any():
+        # Empty shapes add no vertices, so each non-empty shape runs up to the next one's start
+        firsts = starts[:-1][nonempty]
+        extents[nonempty, :2] = np.minimum.reduceat(xy, firsts, axis=0)
+        extents[nonempty, 2:] = np.maximum.reduceat(xy, firsts, axis=0)
+    return extents
+
+def convert_batch(shapes, src_crs=METRIC_CRS, dst_crs="EPSG:4326", aoi=None):
+    """
+    GeoJSON geometries for a list of shapes, reprojected in one call
+    With aoi, a lon/lat (min_lon, min_lat, max_lon, max_lat) window, also
+    returns a mask of the shapes whose lon/lat extent meets it
+    """
+    xy, part_offsets, shape_offsets = shapes_to_buffer(shapes)
+    projected = reproject_buffer(xy, src_crs, dst_crs)
+    geometries = buffer_geometries([shape.shapeType for shape in shapes], projected, part_offsets, shape_offsets)
+    if aoi is None:
+        return geometries
+
+    lonlat = projected if dst_crs == "EPSG:4326" else reproject_buffer(projected, dst_crs, "EPSG:4326")
+    return geometries, boxes_intersect(buffer_extents(lonlat, part_offsets, shape_offsets), aoi)
+
+def shape_bboxes(shapefile_path):
+    """
+    (N, 4) xmin, ymin, xmax, ymax of every shape, or None without a .shx
+    Record offsets come from the .shx and each record's bounding box (a
+    point's own coordinates) from the first bytes of its .shp record, so
+    no vertices are read. Null shapes get NaN
+    """
+    stem = os.path.splitext(shapefile_path)[0]
+    shx_path = next((stem + ext for ext in (".shx", ".SHX") if os.path.isfile(stem + ext)), None)
+    if shx_path is None:
+        return None
+
+    with open(shx_path, "rb") as f:
+        f.seek(100)  # Skip the file header
+        index = np.frombuffer(f.read(), dtype=">i4").reshape(-1, 2)
+    offsets = index[:, 0].astype(np.int64) * 2  # 16-bit words -> bytes
+
+    bboxes = np.full((len(offsets), 4), np.nan)
+    with open(shapefile_path, "rb") as f:
+        for i, offset in enumerate(offsets.tolist()):
+            f.seek(offset + 8)  # Skip the record header
+            head = f.read(36)
+            shape_type = struct.unpack("<i", head[:4])[0]
+            if shape_type in (shapefile.POINT, shapefile.POINTZ, shapefile.POINTM):
+                x, y = struct.unpack("<2d", head[4:20])
+                bboxes[i] = (x, y, x, y)
+            elif shape_type != shapefile.NULL:
+                bboxes[i] = struct.unpack("<4d", head[4:36])
+    return bboxes
+
+def boxes_intersect(bboxes, window):
+    """Mask of the (N, 4) boxes that meet window (xmin, ymin, xmax, ymax)"""
+    xmin, ymin, xmax, ymax = window
+    return (bboxes[:, 0] <= xmax) & (bboxes[:, 2] >= xmin) & (bboxes[:, 1] <= ymax) & (bboxes[:, 3] >= ymin)
+
+def iter_window(sf, shapefile_path, window):
+    """
+    (shape, record) pairs of the shapes whose bounding boxes meet window,
+    given in the shapefile's own CRS. Only those shapes are parsed. Null
+    shapes have no extent, so they never meet the window
+    """
+    if not boxes_intersect(np.array([sf.bbox]), window)[0]:
+        return
+
+    bboxes = shape_bboxes(shapefile_path)
+    if bboxes is None:
+        # No index: let pyshp test each record's box as it reads it
+        for shape_record in sf.iterShapeRecords(bbox=window):
+            if shape_record.shape.shapeType != shapefile.NULL:
+                yield shape_record.shape, shape_record.record
+        return
+
+    for i in np.flatnonzero(boxes_intersect(bboxes, window)).tolist():
+        yield sf.shape(i), sf.record(i)
+
+def convert_records(batch, src_crs=METRIC_CRS, dst_crs="EPSG:4326", aoi=None):
+    """
+    (geometry, properties) pairs for a batch of (shape, properties)
+    The shapefile index only narrows the AOI down to a projected window
+    that encloses it, so with aoi each shape's lon/lat extent is checked
+    again here and the shapes that miss it are dropped
+    """
+    shapes = [shape for shape, _ in batch]
+    attributes = [properties for _, properties in batch]
+    if aoi is None:
+        return list(zip(convert_batch(shapes, src_crs, dst_crs), attributes))
+
+    geometries, inside = convert_batch(shapes, src_crs, dst_crs, aoi)
+    return [(geometry, properties)
+            for geometry, properties, hit in zip(geometries, attributes, inside.tolist()) if hit]
+
+def iter_shapefile(shapefile_path, src_crs=METRIC_CRS, dst_crs="EPSG:4326", keep=None, aoi=None,
+                   batch_size=BATCH_SIZE):
+    """
+    Stream (geometry, properties) pairs from a shapefile in shape order
+    Only batch_size shape records are held at a time. aoi, a lon/lat
+    (min_lon, min_lat, max_lon, max_lat) window, skips shapes whose
+    bounding boxes miss it without reading them, then drops those whose
+    reprojected lon/lat extent misses it; null shapes are skipped too,
+    having no extent. keep(shape, properties), if given, drops
+    records before they are reprojected. Geometries of null shapes are
+    None
+    """
+    with shapefile.Reader(shapefile_path) as sf:
+        fields = [field[0] for field in sf.fields[1:]]  # Skip deletion flag field
+
+        if aoi is None:
+            shape_records = ((shape_record.shape, shape_record.record) for shape_record in sf.iterShapeRecords())
+        else:
+            shape_records = iter_window(sf, shapefile_path, lonlat_bounds_to(aoi, src_crs))
+
+        batch = []
+        for shape, record in shape_records:
+            properties = record_properties(fields, record)
+            if keep is not None and not keep(shape, properties):
+                continue
+            batch.append((shape, properties))
+
+            if len(batch) >= batch_size:
+                yield from convert_records(batch, src_crs, dst_crs, aoi)
+                batch = []
+
+        if batch:
+            yield from convert_records(batch, src_crs, dst_crs, aoi)
+
+def iter_geometries(shapefile_path, src_crs=METRIC_CRS, dst_crs="EPSG:4326", aoi=None):
+    """Stream each shape in a shapefile as a GeoJSON geometry (or None) in dst_crs"""
+    for geometry, _ in iter_shapefile(shapefile_path, src_crs, dst_crs, aoi=aoi):
+        yield geometry
+
+def read_geometries(shapefile_path, src_crs=METRIC_CRS, dst_crs="EPSG:4326"):
+    """Every shape in a shapefile as a GeoJSON geometry (or None) in dst_crs"""
+    return list(iter_geometries(shapefile_path, src_crs, dst_crs))
+
+def read_shapefile(shapefile_path, src_crs=METRIC_CRS, dst_crs="EPSG:4326"):
+    """
+    Geometries and DBF attributes of every shape in a shapefile
+    Returns (geometries, properties), two lists in shape order
+    """
+    geometries, attributes = [], []
+    for geometry, properties in iter_shapefile(shapefile_path, src_crs, dst_crs):
+        geometries.append(geometry)
+        attributes.append(properties)
+    return geometries, attributes
+
+def iter_features(shapefile_path, src_crs=METRIC_CRS, dst_crs="EPSG:4326", properties=None, keep=None,
+                  aoi=None):
+    """
+    Stream GeoJSON features for the non-null shapes in a shapefile
+    Each feature carries its DBF attributes, updated with properties
+    """
+    for geometry, feature_properties in iter_shapefile(shapefile_path, src_crs, dst_crs, keep, aoi):
+        if geometry is None:
+            continue
+        feature_properties.update(properties or {})
+        yield {
+            "type": "Feature",
+            "properties": feature_properties,
+            "geometry": geometry
+        }
+
+def shapefile_features(shapefile_path, src_crs=METRIC_CRS, dst_crs="EPSG:4326", properties=None, aoi=None):
+    """GeoJSON features for every non-null shape in a shapefile, as a list"""
+    return list(iter_features(shapefile_path, src_crs, dst_crs, properties, aoi=aoi))
+
+class FeatureCollectionWriter:
+    """
+    Write a FeatureCollection one feature at a time, laid out exactly as
+    json.dump(..., indent=2) would write it
+    The collection is written to a .partial file and renamed into place
+    only when closed cleanly, so an error never leaves a truncated file
+    at output_path. rollback() drops the features written since the last
+    mark(), e.g. those of a layer that failed part-way
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.partial_path = f"{output_path}.{os.getpid()}.partial"
+        self.file = open(self.partial_path, 'w')
+        self.file.write('{\n  "type": "FeatureCollection",\n  "features": [')
+        self.count = 0
+        self.mark()
+
+    def write(self, feature):
+        self.file.write(",\n" if self.count else "\n")
+        self.file.write(textwrap.indent(json.dumps(feature, indent=2), "    "))
+        self.count += 1
+
+    def mark(self):
+        self._mark = (self.file.tell(), self.count)
+
+    def rollback(self):
+        position, self.count = self._mark
+        self.file.seek(position)
+        self.file.truncate()
+
+    def close(self):
+        """Finish the collection and move it to output_path"""
+        self.file.write("\n  ]\n}" if self.count else "]\n}")
+        self.file.close()
+        os.replace(self.partial_path, self.output_path)
+
+    def abort(self):
+        """Discard everything written, leaving output_path untouched"""
+        self.file.close()
+        os.remove(self.partial_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def write_features(features, output_path):
+    """
+    Write a FeatureCollection one feature at a time from any iterable
+    output_path is only replaced once every feature is written. Returns
+    the number of features written
+    """
+    with FeatureCollectionWriter(output_path) as writer:
+        for feature in features:
+            writer.write(feature)
+    return writer.count
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Centerlines from parallel strands of a thick red line
+Each strand is aligned to a reference strand with dynamic time warping
+restricted to a band around the diagonal, so memory is O(n * band), and
+the centerline point for each reference vertex is the mean of the points
+matched to it across all strands
+"""
+
+import numpy as np
+
+from line_resample import resample_line
+
+def orient_like(reference, strand):
+    """strand, reversed if its ends line up better with reference that way"""
+    forward = np.hypot(*(reference[0] - strand[0])) + np.hypot(*(reference[-1] - strand[-1]))
+    backward = np.hypot(*(reference[0] - strand[-1])) + np.hypot(*(reference[-1] - strand[0]))
+    return strand[::-1] if backward < forward else strand
+
+def band_limits(n, m, band):
+    """Column range [lo, hi) of each row's band, centred on the diagonal"""
+    # Wide enough that consecutive rows' bands always overlap
+    band = max(band, -(-m // n), 1)
+    centers = np.round(np.arange(n) * (m - 1) / max(n - 1, 1)).astype(int)
+    lo = np.clip(centers - band, 0, m - 1)
+    hi = np.clip(centers + band, 0, m - 1) + 1
+    lo[0], hi[-1] = 0, m
+    return lo, hi
+
+def dtw_path(a, b, band=None):
+    """
+    Banded DTW alignment of point arrays a (n, 2) and b (m, 2)
+    Returns (ia, ib) index arrays of the matched pairs, from (0, 0) to
+    (n - 1, m - 1). band defaults to a tenth of the longer strand. Each
+    row is filled at once: the left-neighbour recurrence
+    D[j] = c[j] + min(up[j], D[j - 1]) unrolls to a cumulative minimum
+    """
+    n, m = len(a), len(b)
+    lo, hi = band_limits(n, m, band if band is not None else max(n, m) // 10)
+
+    rows = []
+    for i in range(n):
+        cost = np.hypot(*(b[lo[i]:hi[i]] - a[i]).T)
+        total = np.cumsum(cost)
+        if i == 0:
+            rows.append(total)
+            continue
+
+        # Best of the cells above and above-left, inf outside the previous band
+        cols = np.arange(lo[i] - 1, hi[i])
+        above = np.full(len(cols), np.inf)
+        inside = (cols >= lo[i - 1]) & (cols < hi[i - 1])
+        above[inside] = rows[-1][cols[inside] - lo[i - 1]]
+        up = np.minimum(above[1:], above[:-1])
+
+        before = np.concatenate(([0.0], total[:-1]))
+        rows.append(total + np.minimum.accumulate(up - before))
+
+    def cell(i, j):
+        if i < 0 or j < lo[i] or j >= hi[i]:
+            return np.inf
+        return rows[i][j - lo[i]]
+
+    # Walk back from the last cell along the cheapest predecessor
+    i, j = n - 1, m - 1
+    path = [(i, j)]
+    while i > 0 or j > 0:
+        steps = [(cell(i - 1, j - 1), i - 1, j - 1), (cell(i - 1, j), i - 1, j), (cell(i, j - 1), i, j - 1)]
+        _, i, j = min(step for step in steps if step[1] >= 0 and step[2] >= 0)
+        path.append((i, j))
+
+    ia, ib = np.array(path[::-1]).T
+    return ia, ib
+
+def strands_are_parallel(strands, max_separation, min_overlap=0.5, samples=50, max_angle=30):
+    """
+    Whether every strand runs alongside the longest one
+    At least min_overlap of each strand's points must lie within
+    max_separation of the longest strand, opposite its interior (their
+    nearest point on it is not one of its ends) and heading within
+    max_angle degrees of it there, either way. Pieces that follow each
+    other along a route, or turn off it, are then not taken for parallel
+    edges
+    """
+    reference_index = max(range(len(strands)), key=lambda k: len(strands[k]))
+    reference = np.asarray(resample_line([list(p[:2]) for p in strands[reference_index]], samples * 4),
+                           dtype=np.float64)
+    reference_heading = np.gradient(reference, axis=0)
+    min_cos = np.cos(np.radians(max_angle))
+
+    for k, strand in enumerate(strands):
+        if k == reference_index:
+            continue
+        sampled = np.asarray(resample_line([list(p[:2]) for p in strand], samples), dtype=np.float64)
+        distances = np.hypot(*(sampled[:, None, :] - reference[None, :, :]).transpose(2, 0, 1))
+        nearest = distances.argmin(axis=1)
+        alongside = (distances.min(axis=1) <= max_separation) & (nearest > 0) & (nearest < len(reference) - 1)
+
+        # Parallel edges may be traced in opposite directions, so only the line matters
+        heading = np.gradient(sampled, axis=0)
+        along = reference_heading[nearest]
+        cos = np.abs((heading * along).sum(axis=1)) / (np.hypot(*heading.T) * np.hypot(*along.T) + 1e-12)
+        alongside &= cos >= min_cos
+
+        if alongside.mean() < min_overlap:
+            return False
+    return True
+
+def strands_centerline(strands, num_points=None, band=None):
+    """
+    Centerline of two or more roughly parallel strands
+    Strands are resampled to num_points (default: the longest strand's
+    point count), oriented like the longest one and DTW-aligned to it.
+    Returns a list of [x, y] points
+    """
+    if num_points is None:
+        num_points = max(len(strand) for strand in strands)
+    resampled = [np.asarray(resample_line([list(p[:2]) for p in strand], num_points), dtype=np.float64)
+                 for strand in strands]
+
+    reference_index = max(range(len(strands)), key=lambda k: len(strands[k]))
+    reference = resampled[reference_index]
+
+    total = reference.copy()
+    for k, strand in enumerate(resampled):
+        if k == reference_index:
+            continue
+        strand = orient_like(reference, strand)
+        ia, ib = dtw_path(reference, strand, band)
+
+        # Mean of the strand points matched to each reference vertex
+        counts = np.bincount(ia, minlength=len(reference))
+        matched = np.column_stack([np.bincount(ia, weights=strand[ib, axis], minlength=len(reference))
+                                   for axis in range(2)])
+        total += matched / counts[:, None]
+
+    return (total / len(resampled)).tolist()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Checks for batch spike removal on lines that should survive it
+Run with: python3 -m pytest test_line_despike.py
+"""
+
+import numpy as np
+
+from line_despike import spike_mask
+
+def max_deviation(points, kept):
+    """Largest distance from any of points to the polyline through kept"""
+    best = np.full(len(points), np.inf)
+    for a, b in zip(kept[:-1], kept[1:]):
+        ab = b - a
+        t = np.clip((points - a) @ ab / (ab @ ab), 0, 1)
+        best = np.minimum(best, np.hypot(*(points - (a + t[:, None] * ab)).T))
+    return best.max()
+
+def test_smooth_arc_stays_within_tolerance():
+    # Quarter circle of radius 5 km in 2 m steps: every vertex turns by a
+    # tiny angle, so all interior points are flagged as "spikes"
+    angles = np.linspace(0, np.pi / 2, 3928)
+    arc = 5000 * np.column_stack([np.cos(angles), np.sin(angles)])
+
+    keep = spike_mask(arc, max_offset=20)
+
+    assert keep[0] and keep[-1]
+    assert keep.sum() < len(arc)
+    assert max_deviation(arc, arc[keep]) < 20
+
+def test_sharp_corner_is_kept():
+    line = np.array([[0, 0], [100, 0], [200, 0], [200, 100], [200, 200]], dtype=float)
+
+    keep = spike_mask(line, max_offset=20)
+
+    assert keep[2]  # The corner at (200, 0)
+    assert max_deviation(line, line[keep]) == 0
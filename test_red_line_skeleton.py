@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Checks for the NumPy Zhang-Suen thinning used when no compiled one is installed
+Run with: python3 -m pytest test_red_line_skeleton.py
+"""
+
+import cv2
+import numpy as np
+
+from red_line_skeleton import _zhang_suen
+
+def assert_thin_and_connected(mask, skeleton):
+    """The skeleton lies in the mask, has no 2x2 block and is one 8-connected piece"""
+    assert skeleton.any()
+    assert not (skeleton & ~(mask > 0)).any()
+    assert not (skeleton[:-1, :-1] & skeleton[:-1, 1:] & skeleton[1:, :-1] & skeleton[1:, 1:]).any()
+    count, _ = cv2.connectedComponents(skeleton.astype(np.uint8), connectivity=8)
+    assert count == 2  # Background and the skeleton
+
+def test_thick_line_thins_to_one_pixel():
+    mask = np.zeros((40, 120), np.uint8)
+    mask[15:24, 10:110] = 255
+
+    skeleton = _zhang_suen(mask)
+
+    assert_thin_and_connected(mask, skeleton)
+    ys, xs = np.nonzero(skeleton)
+    assert xs.min() <= 20 and xs.max() >= 100  # Runs most of the stroke's length
+    assert (np.bincount(xs)[20:100] == 1).all()  # One pixel per column along it
+
+def test_l_corner_stays_connected():
+    mask = np.zeros((100, 100), np.uint8)
+    mask[10:90, 10:19] = 255  # Vertical arm
+    mask[81:90, 10:90] = 255  # Horizontal arm
+
+    skeleton = _zhang_suen(mask)
+
+    assert_thin_and_connected(mask, skeleton)
+    ys, xs = np.nonzero(skeleton)
+    assert ys.min() <= 20 and xs.max() >= 80  # Reaches into both arms
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Checks for the area-of-interest filter in shapefile to GeoJSON conversion
+Run with: python3 -m pytest test_shapefile_geojson.py
+"""
+
+import shapefile
+
+from geo_transforms import GOLDEN_TRIANGLE_BBOX, METRIC_CRS, get_transformer, lonlat_bounds_to
+from shapefile_geojson import shapefile_features
+
+def write_points(path, points):
+    """Point shapefile (no .prj, so read as METRIC_CRS) with a name field"""
+    with shapefile.Writer(str(path), shapeType=shapefile.POINT) as w:
+        w.field("NAME", "C")
+        for name, (x, y) in points.items():
+            w.point(x, y)
+            w.record(name)
+
+def test_aoi_drops_shapes_outside_the_lonlat_box(tmp_path):
+    min_lon, min_lat, max_lon, max_lat = GOLDEN_TRIANGLE_BBOX
+    to_metric = get_transformer("EPSG:4326", METRIC_CRS)
+
+    # The projected window encloses the curved lon/lat box, so its corner
+    # lies inside the window but outside the box
+    xmin, ymin, xmax, ymax = lonlat_bounds_to(GOLDEN_TRIANGLE_BBOX, METRIC_CRS)
+    corner = (xmin + 1, ymax - 1)
+    lon, lat = get_transformer(METRIC_CRS, "EPSG:4326").transform(*corner)
+    assert not (min_lon <= lon <= max_lon and min_lat <= lat <= max_lat)
+
+    path = tmp_path / "claims.shp"
+    write_points(path, {
+        "inside": to_metric.transform((min_lon + max_lon) / 2, (min_lat + max_lat) / 2),
+        "corner": corner,
+    })
+
+    features = shapefile_features(str(path), METRIC_CRS, aoi=GOLDEN_TRIANGLE_BBOX)
+
+    assert [feature["properties"]["NAME"] for feature in features] == ["inside"]